@@ -0,0 +1,1321 @@
+# Benchmarks for final.py, run against a local stand-in for the Dish TV EPG endpoint.
+#
+#   python benchmark.py                                # everything, results in benchmark_results.json
+#   python benchmark.py --suite stages --pages 40 --latency 0.1 --error-rate 0.05
+#   python benchmark.py --record fixtures/             # record today's live pages (needs credentials)
+#   python benchmark.py --suite stages --fixtures fixtures/
+#
+# Apart from --record, nothing here touches the network: a small HTTP server
+# on 127.0.0.1 serves synthetic (or recorded) `/services/epg/channels` pages
+# shaped like the real ones.
+
+# --- IMPORTS ---
+import argparse
+import contextlib
+import glob
+import gzip
+import html
+import io
+import json
+import multiprocessing
+import os
+import random
+import re
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import final
+
+# ==============================================================================
+# --- STAND-IN EPG SERVER ---
+# ==============================================================================
+
+def make_synthetic_channels(date_str, page_num, channels_per_page, programs_per_channel=24, channel_names=()):
+    """
+    Builds one page of channels in the same shape the real endpoint returns.
+    The first channels of the lineup can be given real names with `channel_names`.
+    """
+    day = datetime.strptime(date_str, '%d/%m/%Y')
+    slot = timedelta(minutes=1440 // programs_per_channel)
+    channels = []
+    for c in range(channels_per_page):
+        channel_no = (page_num - 1) * channels_per_page + c
+        programs = []
+        for p in range(programs_per_channel):
+            start = day + slot * p
+            programs.append({
+                'title': f'Program {channel_no}-{p}',
+                'desc': f'Synthetic description for program {p} on channel {channel_no}.',
+                'start': start.strftime('%Y-%m-%dT%H:%M:%SZ'),
+                'stop': (start + slot).strftime('%Y-%m-%dT%H:%M:%SZ'),
+            })
+        name = channel_names[channel_no] if channel_no < len(channel_names) else f'Channel {channel_no}'
+        channels.append({'channelname': name, 'programs': programs})
+    return channels
+
+
+def parse_form_data(handler):
+    """Decodes the multipart body `requests` sends for `files=` form fields."""
+    length = int(handler.headers.get('Content-Length', 0))
+    body = handler.rfile.read(length)
+    raw = f"Content-Type: {handler.headers['Content-Type']}\r\n\r\n".encode() + body
+    message = BytesParser(policy=HTTP).parsebytes(raw)
+    fields = {}
+    for part in message.iter_parts():
+        fields[part.get_param('name', header='content-disposition')] = part.get_content().strip()
+    return fields
+
+
+class StandInEPGServer:
+    """
+    Threaded local HTTP server that answers POST /services/epg/channels with
+    `total_pages` synthetic pages of `channels_per_page` channels each, after
+    sleeping `latency` seconds per request to mimic the real round trip.
+
+    With `fixture_dir`, the recorded pages in it (`page-<n>.json`, as written
+    by `record_fixtures`) are served instead, for every date.
+
+    Errors can be injected two ways: the first `fail_first` requests for each
+    page, and a seeded random `error_rate` share of all requests, are answered
+    with `error_status` so the client's retry path can be exercised.
+    """
+    def __init__(self, total_pages=10, channels_per_page=20, latency=0.1, fail_first=0,
+                 error_rate=0.0, error_status=503, fixture_dir=None, programs_per_channel=24, seed=0,
+                 channel_names=()):
+        self.channels_per_page = channels_per_page
+        self.channel_names = list(channel_names)
+        self.programs_per_channel = programs_per_channel
+        self.latency = latency
+        self.fail_first = fail_first
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.fixtures = load_fixtures(fixture_dir) if fixture_dir else None
+        self.total_pages = len(self.fixtures) if self.fixtures else total_pages
+        self.request_count = 0
+        self.error_count = 0
+        self.connection_count = 0
+        self.bytes_sent = 0
+        self._rng = random.Random(seed)
+        self._attempts = {}
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer(('127.0.0.1', 0), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address
+        return f"http://{host}:{port}/services/epg/channels"
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def setup(self):
+                super().setup()
+                with server._lock:
+                    server.connection_count += 1
+
+            def do_POST(self):
+                fields = parse_form_data(self)
+                page_key = (fields.get('date'), fields.get('pageNum'))
+                with server._lock:
+                    server.request_count += 1
+                    attempt = server._attempts[page_key] = server._attempts.get(page_key, 0) + 1
+                    failed = attempt <= server.fail_first or server._rng.random() < server.error_rate
+                    server.error_count += failed
+                time.sleep(server.latency)
+                if failed:
+                    self.send_response(server.error_status)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                body = server.page_body(fields.get('date'), int(fields.get('pageNum', 1)))
+                with server._lock:
+                    server.bytes_sent += len(body)
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def page_body(self, date_str, page_num):
+        """The response body for one page, as the endpoint would send it."""
+        if self.fixtures:
+            return self.fixtures[page_num - 1]
+        payload = {
+            'totalPages': self.total_pages,
+            'programDetailsByChannel': make_synthetic_channels(
+                date_str, page_num, self.channels_per_page, self.programs_per_channel, self.channel_names),
+        }
+        return json.dumps(payload).encode('utf-8')
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+def load_fixtures(fixture_dir):
+    """Recorded page bodies from `fixture_dir`, in page order."""
+    names = sorted((name for name in os.listdir(fixture_dir) if name.startswith('page-') and name.endswith('.json')),
+                   key=lambda name: int(name[len('page-'):-len('.json')]))
+    if not names:
+        raise ValueError(f"No page-<n>.json fixtures in {fixture_dir}")
+    bodies = []
+    for name in names:
+        with open(os.path.join(fixture_dir, name), 'rb') as f:
+            bodies.append(f.read())
+    return bodies
+
+
+def record_fixtures(fixture_dir, date_str=None, max_pages=None):
+    """
+    Records the live endpoint's pages for `date_str` (today by default) into
+    `fixture_dir` as page-<n>.json, for StandInEPGServer(fixture_dir=...).
+    This is the only function here that touches the network.
+    """
+    date_str = date_str or datetime.now(final.IST_TIMEZONE).strftime('%d/%m/%Y')
+    auth_token, cookie_string, _ = final.get_credentials()
+    if not (auth_token and cookie_string):
+        raise RuntimeError("Could not get credentials to record fixtures.")
+    os.makedirs(fixture_dir, exist_ok=True)
+    with final.EPGClient(auth_token, cookie_string) as client:
+        page_num, total_pages = 1, 1
+        while page_num <= total_pages and (max_pages is None or page_num <= max_pages):
+            form_data = final.build_page_form_data(date_str, page_num, client.channel_genre, client.language)
+            _, body = client.post(form_data)
+            total_pages = json.loads(body).get('totalPages', 1)
+            with open(os.path.join(fixture_dir, f'page-{page_num}.json'), 'wb') as f:
+                f.write(body)
+            page_num += 1
+    print(f"📼 Recorded {page_num - 1} of {total_pages} page(s) for {date_str} into {fixture_dir}")
+
+# ==============================================================================
+# --- BENCHMARKS ---
+# ==============================================================================
+
+def benchmark_concurrent_fetch(total_pages=10, latency=0.1, max_concurrent=8):
+    """Fetches today and tomorrow serially (one request at a time) and concurrently."""
+    today = datetime.now()
+    dates = [today.strftime('%d/%m/%Y'), (today + timedelta(days=1)).strftime('%d/%m/%Y')]
+
+    print("\n" + "=" * 60)
+    print(f"--- Concurrent fetch: {len(dates)} dates x {total_pages} pages, {latency * 1000:.0f} ms latency ---")
+
+    timings = {}
+    with StandInEPGServer(total_pages=total_pages, latency=latency) as server:
+        # Old behaviour: one date after the other, one page at a time.
+        started = time.perf_counter()
+        with final.EPGClient('token', 'cookie', server.url, max_concurrent=1, requests_per_second=1000) as client, \
+             ThreadPoolExecutor(max_workers=1) as one_at_a_time:
+            serial_results = {
+                date_str: final.fetch_tv_guide(client, date_str, one_at_a_time)
+                for date_str in dates
+            }
+        timings['serial'] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        with final.EPGClient('token', 'cookie', server.url, max_concurrent=max_concurrent,
+                             requests_per_second=1000, burst=max_concurrent) as client:
+            concurrent_results = final.fetch_tv_guides(client, dates)
+        timings['concurrent'] = time.perf_counter() - started
+
+    for results in (serial_results, concurrent_results):
+        for channels, pages, failed in results.values():
+            assert pages == total_pages and not failed
+            assert [ch['channelname'] for ch in channels] == [f'Channel {n}' for n in range(len(channels))]
+
+    print(f"\n⏱️ serial: {timings['serial']:.2f}s   concurrent ({max_concurrent} workers): {timings['concurrent']:.2f}s"
+          f"   speedup: {timings['serial'] / timings['concurrent']:.1f}x")
+    return timings
+
+
+def benchmark_session_reuse(total_pages=10, latency=0.02, max_concurrent=4, fail_first=1):
+    """Checks that the pooled client reuses connections and retries 5xx pages."""
+    today_str = datetime.now().strftime('%d/%m/%Y')
+
+    print("\n" + "=" * 60)
+    print(f"--- Session reuse and retries: {total_pages} pages, first {fail_first} attempt(s) per page fail ---")
+
+    with StandInEPGServer(total_pages=total_pages, latency=latency, fail_first=fail_first) as server:
+        with final.EPGClient('token', 'cookie', server.url, max_concurrent=max_concurrent,
+                             requests_per_second=1000, burst=max_concurrent, backoff_base=0.01) as client:
+            channels, pages, failed = final.fetch_tv_guide(client, today_str)
+            stats = client.stats()
+            latency_state = {name: value for name, value in vars(client).items() if name.startswith('latenc')}
+        connections = server.connection_count
+
+    assert pages == total_pages and not failed, failed
+    assert stats['retries'] == total_pages * fail_first, stats
+    assert stats['requests'] == total_pages * (fail_first + 1), stats
+    assert connections <= max_concurrent, connections
+    # A --serve daemon keeps one client for its lifetime: latency stats must not grow per request.
+    assert not any(isinstance(value, (list, tuple)) for value in latency_state.values()), latency_state
+    assert 0 < stats['latency_avg_ms'] <= stats['latency_max_ms'], stats
+
+    print(f"\n🔁 {stats['requests']} requests over {connections} connection(s), {stats['retries']} retries, "
+          f"{stats['bytes_received']} bytes, avg latency {stats['latency_avg_ms']} ms")
+    return stats
+
+
+def benchmark_targeted_fetch(total_pages=30, channels_per_page=20, latency=0.01,
+                             wanted=('Channel 3', 'Channel 47', 'Channel 95')):
+    """Compares requests, bytes and peak memory of a full fetch and a targeted fetch."""
+    today_str = datetime.now().strftime('%d/%m/%Y')
+
+    print("\n" + "=" * 60)
+    print(f"--- Targeted fetch: {len(wanted)} wanted channels in a {total_pages * channels_per_page}-channel lineup ---")
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp, \
+         StandInEPGServer(total_pages=total_pages, channels_per_page=channels_per_page, latency=latency) as server:
+        channel_index = final.ChannelPageIndex(os.path.join(tmp, 'index.json'))
+        runs = (
+            ("full", None, None),
+            ("targeted, cold index", set(wanted), channel_index),
+            ("targeted, warm index", set(wanted), channel_index),
+        )
+        for label, wanted_channels, index in runs:
+            with final.EPGClient('token', 'cookie', server.url, requests_per_second=1000) as client:
+                tracemalloc.start()
+                channels, _, failed = final.fetch_tv_guide(client, today_str, wanted_channels=wanted_channels,
+                                                           channel_index=index)
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                results[label] = dict(client.stats(), peak_bytes=peak, channels=len(channels))
+            assert not failed
+            if wanted_channels:
+                assert sorted(ch['channelname'] for ch in channels) == sorted(wanted)
+
+    print()
+    for label, r in results.items():
+        print(f"📉 {label:22} requests: {r['requests']:3}   bytes: {r['bytes_received']:9}   "
+              f"peak memory: {r['peak_bytes'] / 1e6:6.1f} MB   channels kept: {r['channels']}")
+    return results
+
+
+def _old_pipeline_peak_rss(url, date_str, total_pages, wanted, json_path):
+    """The pre-streaming path: response.json() per page, one big list, filter, dump, reload."""
+    import requests
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    all_channels = []
+    for page_num in range(1, total_pages + 1):
+        response = requests.post(url, files=final.build_page_form_data(date_str, page_num), timeout=20)
+        all_channels.extend(response.json().get('programDetailsByChannel', []))
+    channels = [ch for ch in all_channels if ch.get('channelname') in wanted]
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump({'programDetailsByChannel': channels}, f, indent=2, ensure_ascii=False)
+    with open(json_path, 'r', encoding='utf-8') as f:
+        channels = json.load(f)['programDetailsByChannel']
+    return baseline, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, len(channels)
+
+
+def _streaming_pipeline_peak_rss(url, date_str, total_pages, wanted, json_path):
+    """The streaming path: channels are filtered and normalized as each page is parsed."""
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    with final.EPGClient('token', 'cookie', url, max_concurrent=1, requests_per_second=1000) as client:
+        channels, _, _ = final.fetch_tv_guide(client, date_str, wanted_channels=wanted)
+    return baseline, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, len(channels)
+
+
+def _run_isolated(target, *args):
+    """Runs `target` in a fresh interpreter so its ru_maxrss is not polluted by earlier benchmarks."""
+    with multiprocessing.get_context('spawn').Pool(1) as pool:
+        return pool.apply(target, args)
+
+
+def benchmark_streaming_memory(total_pages=100, channels_per_page=40, wanted=('Channel 7', 'Channel 2345')):
+    """Compares peak RSS of the old load-everything path and the streaming pipeline."""
+    today_str = datetime.now().strftime('%d/%m/%Y')
+
+    print("\n" + "=" * 60)
+    print(f"--- Streaming pipeline: peak RSS on a {total_pages * channels_per_page}-channel lineup ---")
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp, \
+         StandInEPGServer(total_pages=total_pages, channels_per_page=channels_per_page, latency=0) as server:
+        json_path = os.path.join(tmp, 'guide.json')
+        for label, target in (("old (json + dump/reload)", _old_pipeline_peak_rss),
+                              ("streaming", _streaming_pipeline_peak_rss)):
+            baseline, peak, kept = _run_isolated(target, server.url, today_str, total_pages, set(wanted), json_path)
+            results[label] = {'baseline_kb': baseline, 'peak_kb': peak, 'channels': kept}
+
+    print()
+    for label, r in results.items():
+        print(f"🧠 {label:26} peak RSS: {r['peak_kb'] / 1024:6.1f} MB   "
+              f"(+{(r['peak_kb'] - r['baseline_kb']) / 1024:6.1f} MB over start)   channels kept: {r['channels']}")
+    return results
+
+
+def make_synthetic_guide(num_channels, num_days, programs_per_channel=24, start_date=None):
+    """A merged multi-day guide: one entry per channel holding every day's programs."""
+    start_date = start_date or datetime.now().date()
+    channels = [{'channelname': f'Channel {n}', 'programs': []} for n in range(num_channels)]
+    for day in range(num_days):
+        date_str = (start_date + timedelta(days=day)).strftime('%d/%m/%Y')
+        for channel, page_channel in zip(channels, make_synthetic_channels(date_str, 1, num_channels, programs_per_channel)):
+            channel['programs'].extend(page_channel['programs'])
+    return channels
+
+
+def _dict_program_blocks(channels, target_date):
+    """The pre-Schedule renderer: every program's timestamps are re-parsed for every day."""
+    blocks = []
+    for i, ch in enumerate(channels):
+        bg_color, border_color = final.COLOR_PALETTE[i % len(final.COLOR_PALETTE)]
+        for prog in ch.get('programs', []):
+            p_start = datetime.fromisoformat(prog['start'][:-1])
+            p_stop = datetime.fromisoformat(prog['stop'][:-1])
+            if p_start.date() == target_date:
+                duration_minutes = (p_stop - p_start).total_seconds() / 60
+                if duration_minutes <= 0: continue
+                start_minute_of_day = p_start.hour * 60 + p_start.minute
+                style = (
+                    f'top:{(start_minute_of_day / 1440) * 100:.4f}%; left:{i * 200}px; height:{(duration_minutes / 1440) * 100:.4f}%; width:190px;'
+                    f'background-color: {bg_color}; border-color: {border_color};'
+                )
+                description = html.escape(prog.get("desc", "No description available."))
+                title = html.escape(prog.get("title", "Untitled Program"))
+                time_str = f'{p_start.strftime("%H:%M")} - {p_stop.strftime("%H:%M")}'
+                blocks.append(
+                    f'<div class="program-block" style="{style}" data-description="{description}">'
+                    f'<span class="program-title">{title}</span>'
+                    f'<span class="program-time">{time_str}</span>'
+                    '</div>'
+                )
+    return ''.join(blocks)
+
+
+_BLOCK_FIELDS = re.compile(r'top:([\d.]+)%.*?height:([\d.]+)%.*?data-description="([^"]*)">'
+                           r'<span class="program-title">([^<]*)</span><span class="program-time">([^<]*)</span>')
+
+
+def _block_fields(markup):
+    """What a viewer sees of each block (position, texts), whichever markup produced it."""
+    return _BLOCK_FIELDS.findall(markup)
+
+
+def _dict_print(channels):
+    """The pre-Schedule console printer: slices the ISO strings of every program."""
+    for channel in channels:
+        print(f"\n- {channel.get('channelname', 'Unknown Channel')}")
+        for program in channel['programs']:
+            print(f"  ⏰ {program['start'][11:16]} - {program['stop'][11:16]}: {program.get('title', 'Unknown Program')}")
+
+
+def benchmark_schedule_model(num_channels=200, num_days=7, programs_per_channel=24):
+    """Compares parse + print + render of the dict path and the Schedule path over a multi-day guide."""
+    channels = make_synthetic_guide(num_channels, num_days, programs_per_channel)
+    days = [datetime.now().date() + timedelta(days=d) for d in range(num_days)]
+    total = num_channels * num_days * programs_per_channel
+
+    print("\n" + "=" * 60)
+    print(f"--- Schedule model: {num_channels} channels x {num_days} days, {total} programs ---")
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        started = time.perf_counter()
+        _dict_print(channels)
+        old_html = [_dict_program_blocks(channels, day) for day in days]
+        old_time = time.perf_counter() - started
+
+        started = time.perf_counter()
+        schedule = final.Schedule.from_channels(channels)
+        parse_time = time.perf_counter() - started
+        channel_ids = list(range(len(schedule.channel_names)))
+        for day in days:
+            final.print_guide(schedule, day, str(day))
+        new_html = [final.generate_program_blocks(schedule, channel_ids, day) for day in days]
+        new_time = time.perf_counter() - started
+
+    assert [_block_fields(markup) for markup in old_html] == [_block_fields(markup) for markup in new_html]
+    print(f"\n⏱️ dict path: {old_time:.2f}s   Schedule path: {new_time:.2f}s "
+          f"(of which ingest {parse_time:.2f}s)   speedup: {old_time / new_time:.1f}x")
+    return {'dict_seconds': old_time, 'schedule_seconds': new_time, 'ingest_seconds': parse_time}
+
+
+def check_archive_partial_fetch():
+    """A day that failed to fetch keeps its archived programs and is still served from the archive."""
+    today = datetime.now(final.IST_TIMEZONE).date()
+    tomorrow = today + timedelta(days=1)
+    both_days = final.Schedule.from_channels(make_synthetic_guide(2, 2, 4, start_date=today))
+    today_only = final.Schedule.from_channels(make_synthetic_guide(2, 1, 4, start_date=today))
+    with tempfile.TemporaryDirectory() as tmp, final.ScheduleArchive(os.path.join(tmp, 'archive.sqlite3')) as archive:
+        archive.store(both_days, [today, tomorrow])
+        archive.store(today_only, [today])
+        assert len(archive.programs_on_day('Channel 0', tomorrow)) == 4, "a failed day lost its archived rows"
+        assert len(archive.load_schedule(today, tomorrow + timedelta(days=1))) == 16
+        # A configured channel missing from this run comes back from the archive; one never archived is left out.
+        channel_1_failed = final.Schedule.from_channels(make_synthetic_guide(1, 2, 4, start_date=today))
+        archive.store(channel_1_failed, [today, tomorrow])
+        loaded = archive.load_schedule(today, tomorrow + timedelta(days=1), ['Channel 0', 'Channel 1', 'Never seen'])
+        assert loaded.channel_names == ['Channel 0', 'Channel 1'] and len(loaded.programs(1)) == 8, loaded.channel_names
+    print("✅ archive: a day or a channel that failed to fetch is served from the archive")
+
+
+def benchmark_archive_lookups(num_channels=200, history_days=(7, 30, 90), lookups=2000):
+    """Times per-channel-per-day archive lookups as the stored history grows."""
+    check_archive_partial_fetch()
+
+    print("\n" + "=" * 60)
+    print(f"--- Schedule archive: {lookups} channel/day lookups, {num_channels} channels ---")
+
+    results = {}
+    today = datetime.now(final.IST_TIMEZONE).date()
+    for days in history_days:
+        first_day = today - timedelta(days=days - 1)
+        schedule = final.Schedule.from_channels(make_synthetic_guide(num_channels, days, start_date=first_day))
+        with tempfile.TemporaryDirectory() as tmp:
+            with final.ScheduleArchive(os.path.join(tmp, 'archive.sqlite3')) as archive:
+                started = time.perf_counter()
+                archive.store(schedule, [first_day + timedelta(days=d) for d in range(days)])
+                store_time = time.perf_counter() - started
+
+                rng = random.Random(days)
+                started = time.perf_counter()
+                for _ in range(lookups):
+                    day = first_day + timedelta(days=rng.randrange(days))
+                    assert len(archive.programs_on_day(f'Channel {rng.randrange(num_channels)}', day)) == 24
+                lookup_time = time.perf_counter() - started
+                size_before = os.path.getsize(archive.path)
+                archive.compact(retention_days=7)
+                size_after = os.path.getsize(archive.path)
+        results[days] = {'store_seconds': store_time, 'lookup_us': lookup_time / lookups * 1e6,
+                         'size_bytes': size_before, 'compacted_size_bytes': size_after}
+        print(f"🗄️ {days:3} days of history: store {store_time:5.2f}s   lookup {lookup_time / lookups * 1e6:6.1f} µs   "
+              f"size {size_before / 1e6:5.1f} MB -> {size_after / 1e6:5.1f} MB after 7-day compaction")
+    return results
+
+
+def benchmark_virtual_output(channel_counts=(50, 300, 1000), num_days=2):
+    """
+    Compares what a browser has to load before the first paint: the inline
+    day grids (every program block of every day) against the virtual shell
+    page plus its manifest and the first data chunk.
+    """
+    print("\n" + "=" * 60)
+    print(f"--- Virtualized output: first-paint payload, {num_days} days ---")
+
+    results = {}
+    days = [datetime.now().date() + timedelta(days=d) for d in range(num_days)]
+    for num_channels in channel_counts:
+        schedule = final.Schedule.from_channels(make_synthetic_guide(num_channels, num_days))
+        channel_ids = list(range(num_channels))
+
+        started = time.perf_counter()
+        inline_bytes = sum(len(final.generate_program_blocks(schedule, channel_ids, day).encode()) for day in days)
+        inline_time = time.perf_counter() - started
+
+        with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()):
+            original_channels, final.desired_channels = final.desired_channels, []
+            try:
+                started = time.perf_counter()
+                final.create_virtual_guide(schedule, days, 'index.html', tmp)
+                virtual_time = time.perf_counter() - started
+            finally:
+                final.desired_channels = original_channels
+            data_dir = os.path.join(tmp, final.VIRTUAL_DATA_DIR)
+            first_paint = sum(os.path.getsize(path) for path in (
+                os.path.join(tmp, 'index.html'),
+                *glob.glob(os.path.join(tmp, final.SITE_ASSETS_DIR, '*.css')),
+                *glob.glob(os.path.join(tmp, final.SITE_ASSETS_DIR, '*.js')),
+                os.path.join(data_dir, 'manifest.json'),
+                os.path.join(data_dir, days[0].isoformat(), 'chunk-0.json'),
+            ))
+            total = sum(os.path.getsize(os.path.join(root, name))
+                        for root, _, names in os.walk(tmp) for name in names if not name.endswith(('.gz', '.br')))
+
+        results[num_channels] = {'inline_bytes': inline_bytes, 'inline_seconds': inline_time,
+                                 'virtual_first_paint_bytes': first_paint, 'virtual_total_bytes': total,
+                                 'virtual_seconds': virtual_time}
+        print(f"📄 {num_channels:5} channels: inline grids {inline_bytes / 1e6:6.2f} MB ({inline_time:.2f}s)   "
+              f"virtual first paint {first_paint / 1e6:5.2f} MB of {total / 1e6:5.2f} MB ({virtual_time:.2f}s)")
+    return results
+
+
+def benchmark_site_output(num_days=2, programs_per_channel=24):
+    """
+    Builds the inline guide for the configured channels twice into a fresh site
+    directory: reports minified vs precompressed transfer size, and
+    checks that rebuilding an unchanged schedule writes no files at all.
+    """
+    print("\n" + "=" * 60)
+    print(f"--- Site output: {len(final.desired_channels)} channels x {num_days} days ---")
+
+    channels = make_synthetic_guide(len(final.desired_channels), num_days, programs_per_channel)
+    for channel, name in zip(channels, final.desired_channels):
+        channel['channelname'] = name
+    schedule = final.Schedule.from_channels(channels)
+    days = [datetime.now().date() + timedelta(days=d) for d in range(num_days)]
+
+    with tempfile.TemporaryDirectory() as tmp, contextlib.chdir(tmp), contextlib.redirect_stdout(io.StringIO()):
+        final.create_timeline_guide(schedule, None, days)
+        files = [os.path.join(root, name) for root, _, names in os.walk(final.SITE_DIR) for name in names]
+        mtimes = {path: os.stat(path).st_mtime_ns for path in files}
+
+        started = time.perf_counter()
+        final.create_timeline_guide(schedule, None, days)
+        rebuild_time = time.perf_counter() - started
+        rewritten = [path for path in files if os.stat(path).st_mtime_ns != mtimes[path]]
+
+        def transfer(extension):
+            return sum(os.path.getsize(path + extension) if os.path.exists(path + extension) else os.path.getsize(path)
+                       for path in files if not path.endswith(('.gz', '.br')))
+
+        sizes = {'minified_bytes': transfer(''),
+                 'gzip_bytes': transfer('.gz'), 'brotli_bytes': transfer('.br') if final.brotli else None}
+
+    assert not rewritten, f"unchanged schedule rewrote {rewritten}"
+    print(f"📦 minified {sizes['minified_bytes'] / 1e3:7.1f} KB   "
+          f"gzip {sizes['gzip_bytes'] / 1e3:6.1f} KB   "
+          + (f"brotli {sizes['brotli_bytes'] / 1e3:6.1f} KB" if final.brotli else "(brotli not installed)"))
+    print(f"♻️ rebuild of an unchanged schedule: {len(rewritten)} of {len(files)} files written ({rebuild_time:.2f}s)")
+    return dict(sizes, files=len(files), rewritten=len(rewritten), rebuild_seconds=rebuild_time)
+
+
+def benchmark_instrumentation_overhead(iterations=200_000):
+    """Per-call cost of a span, a counter and a histogram observation, with metrics on and off."""
+    print("\n" + "=" * 60)
+    print(f"--- Instrumentation overhead: {iterations} span + count + observe calls ---")
+
+    results = {}
+    for enabled in (False, True):
+        run_metrics = final.RunMetrics(enabled=enabled)
+        started = time.perf_counter()
+        for i in range(iterations):
+            with run_metrics.span('fetch_page', page=i):
+                run_metrics.count('requests')
+                run_metrics.observe('request_latency_seconds', 0.2)
+        elapsed = time.perf_counter() - started
+        results['enabled' if enabled else 'disabled'] = {'ns_per_call': elapsed / iterations * 1e9}
+
+    print(f"📏 disabled: {results['disabled']['ns_per_call']:6.0f} ns per instrumented call   "
+          f"enabled: {results['enabled']['ns_per_call']:6.0f} ns")
+    return results
+
+
+def _cold_process_seconds():
+    """Interpreter start-up plus `import final`: what every cold run pays before it does any work."""
+    started = time.perf_counter()
+    subprocess.run([sys.executable, '-c', 'import final'], check=True,
+                   cwd=os.path.dirname(os.path.abspath(final.__file__)))
+    return time.perf_counter() - started
+
+
+def benchmark_daemon_cycles(cycles=4, total_pages=20, channels_per_page=20, latency=0.02):
+    """
+    Compares the per-update cost of cold runs (fresh process, state loaded from
+    disk, new session and connections every time) with GuideDaemon cycles, and
+    checks the daemon's HTTP endpoint. Chrome and pip installs on a fresh CI
+    runner come on top of the cold figure and are not measured here.
+    """
+    print("\n" + "=" * 60)
+    print(f"--- Daemon vs cold runs: {cycles} updates, {total_pages} pages per date, {latency * 1000:.0f} ms latency ---")
+
+    process_seconds = _cold_process_seconds()
+    wanted = list(final.desired_channels)
+    results = {}
+    with StandInEPGServer(total_pages=total_pages, channels_per_page=channels_per_page, latency=latency,
+                          channel_names=wanted) as server:
+        original_url = final.EPG_CHANNELS_URL
+        final.EPG_CHANNELS_URL = server.url
+        try:
+            for mode in ('cold', 'daemon'):
+                with tempfile.TemporaryDirectory() as tmp, contextlib.chdir(tmp):
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        final.save_cached_credentials('token', 'cookie', time.time() + 3600)
+                    requests_before, connections_before = server.request_count, server.connection_count
+                    daemon = final.GuideDaemon() if mode == 'daemon' else None
+                    timings = []
+                    for cycle in range(cycles):
+                        if cycle:
+                            # Stands in for the interval between updates: the rate limiter refills.
+                            time.sleep(final.REQUEST_BURST / final.REQUESTS_PER_SECOND)
+                        started = time.perf_counter()
+                        with contextlib.redirect_stdout(io.StringIO()):
+                            if daemon:
+                                daemon.run_cycle()
+                            else:
+                                final.metrics = final.RunMetrics()
+                                final.update_guide()
+                        timings.append(time.perf_counter() - started)
+                    if daemon:
+                        _check_guide_server(daemon)
+                        daemon.close()
+                    if mode == 'cold':
+                        timings = [t + process_seconds for t in timings]
+                    results[mode] = {
+                        'first_cycle_seconds': timings[0],
+                        'steady_cycle_seconds': sum(timings[1:]) / max(1, len(timings) - 1),
+                        'requests': server.request_count - requests_before,
+                        'connections': server.connection_count - connections_before,
+                    }
+        finally:
+            final.EPG_CHANNELS_URL = original_url
+
+    print(f"\n🐍 cold process start + import: {process_seconds:.2f}s per run")
+    for mode, r in results.items():
+        print(f"🔁 {mode:6} first update {r['first_cycle_seconds']:5.2f}s   later updates {r['steady_cycle_seconds']:5.2f}s   "
+              f"requests: {r['requests']:3}   new connections: {r['connections']}")
+    return dict(results, cold_process_seconds=process_seconds)
+
+
+def _check_guide_server(daemon):
+    """Fetches the guide, its JSON and /status from the daemon's HTTP endpoint."""
+    httpd = final.make_guide_server(daemon, '127.0.0.1', 0)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{httpd.server_address[1]}"
+    try:
+        with urllib.request.urlopen(urllib.request.Request(base + '/', headers={'Accept-Encoding': 'gzip'})) as r:
+            assert r.headers['Content-Encoding'] == 'gzip' and b'My TV Guide' in gzip.decompress(r.read())
+        with urllib.request.urlopen(base + '/tv_guide_today_and_tomorrow.json') as r:
+            assert json.load(r)['programDetailsByChannel']
+        with urllib.request.urlopen(base + '/status') as r:
+            assert json.load(r)['cycles'] == daemon.cycles
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
+
+def benchmark_schedule_queries(num_channels=600, num_days=7, programs_per_channel=24, queries=300):
+    """Times ScheduleIndex queries against a linear scan of every program, checking both agree."""
+    print("\n" + "=" * 60)
+    print(f"--- Schedule queries: {num_channels} channels x {num_days} days, "
+          f"{num_channels * num_days * programs_per_channel} programs ---")
+
+    # With nothing scraped yet, the CLI explains instead of failing with a traceback.
+    with tempfile.TemporaryDirectory() as tmp:
+        result = subprocess.run([sys.executable, os.path.abspath(final.__file__), 'query', 'now'],
+                                cwd=tmp, capture_output=True, text=True)
+    assert result.returncode == 1 and 'Traceback' not in result.stderr and 'scrape' in result.stdout, result
+
+    start_date = datetime.now().date()
+    schedule = final.Schedule.from_channels(make_synthetic_guide(num_channels, num_days, programs_per_channel,
+                                                                 start_date))
+    started = time.perf_counter()
+    index = final.ScheduleIndex(schedule)
+    build_time = time.perf_counter() - started
+    all_programs = [(schedule.channel_names[p.channel], p)
+                    for channel in range(num_channels) for p in schedule.programs(channel)]
+    first = final.day_start_minutes(start_date)
+    rng = random.Random(14)
+    times = [first + rng.randrange(num_days * final.MINUTES_PER_DAY) for _ in range(queries)]
+    channels = [f'Channel {rng.randrange(num_channels)}' for _ in range(queries)]
+    titles = [f'Program {rng.randrange(num_channels)}-{rng.randrange(programs_per_channel)}' for _ in range(queries)]
+
+    def linear_on_at(name, minute):
+        airing = [p for n, p in all_programs if n == name and p.start <= minute < p.stop]
+        return airing[-1] if airing else None
+
+    def linear_between(start, stop):
+        return sorted(((n, p) for n, p in all_programs if p.start < stop and p.stop > start),
+                      key=lambda hit: (hit[1].start, hit[1].channel))
+
+    def linear_search(text):
+        words = re.findall(r'\w+', text.lower())
+        return sorted(((n, p) for n, p in all_programs
+                       if all(any(w.startswith(q) for w in re.findall(r'\w+', p.title.lower())) for q in words)),
+                      key=lambda hit: (hit[1].start, hit[1].channel))
+
+    cases = {
+        'on channel at time': (lambda i: index.on_at(channels[i], times[i]),
+                               lambda i: linear_on_at(channels[i], times[i])),
+        'airing in next 30 min': (lambda i: index.airing_between(times[i], times[i] + 30),
+                                  lambda i: linear_between(times[i], times[i] + 30)),
+        'title search': (lambda i: index.search_titles(titles[i]),
+                         lambda i: linear_search(titles[i])),
+    }
+    index.search_titles('warm up')  # builds the title index once, outside the timings
+    one_channel = [schedule.channel_names[1]]
+    everywhere = [hit for hit in index.search_titles('Program') if hit[0] in one_channel]
+    assert len(everywhere) > 3
+    assert index.search_titles('Program', limit=3, channel_names=one_channel) == everywhere[:3], \
+        "channel filter must apply before the limit"
+    results = {'index_build_seconds': build_time}
+    for label, (indexed, linear) in cases.items():
+        linear_runs = range(min(queries, 20))
+        for i in linear_runs:
+            assert indexed(i) == linear(i), label
+        started = time.perf_counter()
+        for i in range(queries):
+            indexed(i)
+        indexed_us = (time.perf_counter() - started) / queries * 1e6
+        started = time.perf_counter()
+        for i in linear_runs:
+            linear(i)
+        linear_us = (time.perf_counter() - started) / len(linear_runs) * 1e6
+        results[label] = {'index_us': indexed_us, 'linear_us': linear_us}
+        print(f"🔎 {label:22} index: {indexed_us:8.1f} µs   linear scan: {linear_us:10.1f} µs   "
+              f"speedup: {linear_us / indexed_us:7.0f}x")
+    print(f"🏗️ index build: {build_time:.2f}s")
+    return results
+
+
+def _old_merge(channel_lists):
+    """
+    The merge final.py used to do: the first day's channel dicts extended in
+    place with each later day's programs, later-only channels dropped. It
+    mutates its input, so callers pass a copy.
+    """
+    first, *later = channel_lists
+    combined_channels_dict = {ch['channelname']: ch for ch in first}
+    for channels in later:
+        for ch in channels:
+            ch_name = ch.get('channelname')
+            if ch_name in combined_channels_dict:
+                combined_channels_dict[ch_name]['programs'].extend(ch.get('programs', []))
+    return list(combined_channels_dict.values())
+
+
+def _fresh_copy(channel_lists):
+    return [[{**ch, 'programs': list(ch['programs'])} for ch in channels] for channels in channel_lists]
+
+
+def _day_response(day, channel_names, programs_per_channel=24, late_start=False):
+    """
+    One day's channels as the endpoint returns them with allowPastEvents: with
+    `late_start`, every slot starts 30 minutes late, so the last program of the
+    day runs over midnight and is listed again at the top of the next day.
+    """
+    day_start = datetime.combine(day, datetime.min.time())
+    slot = timedelta(minutes=1440 // programs_per_channel)
+    offset = timedelta(minutes=30) if late_start else timedelta(0)
+    channels = []
+    for c, name in enumerate(channel_names):
+        programs = []
+        if late_start:
+            carried = day_start - slot + offset
+            programs.append({'title': f'{name} late show', 'desc': 'Carried over.',
+                             'start': carried.strftime('%Y-%m-%dT%H:%M:%SZ'),
+                             'stop': (carried + slot).strftime('%Y-%m-%dT%H:%M:%SZ')})
+        for p in range(programs_per_channel):
+            start = day_start + slot * p + offset
+            title = f'{name} late show' if late_start and p == programs_per_channel - 1 else f'{name} program {p}'
+            programs.append({'title': title, 'desc': 'Synthetic.',
+                             'start': start.strftime('%Y-%m-%dT%H:%M:%SZ'),
+                             'stop': (start + slot).strftime('%Y-%m-%dT%H:%M:%SZ')})
+        channels.append({'channelname': name, 'programs': programs})
+    return channels
+
+
+def check_merge_fixtures():
+    """Overlapping and duplicated fixtures through merge_days and the day partition (the repo has no test suite)."""
+    today = datetime(2025, 10, 17).date()
+    tomorrow = today + timedelta(days=1)
+    day1 = _day_response(today, ['A', 'B'], late_start=True)
+    day2 = _day_response(tomorrow, ['B', 'A', 'Tomorrow only'], late_start=True)
+    day2[0]['programs'].insert(3, dict(day2[0]['programs'][3]))            # an exact duplicate within a day
+    day2[1]['programs'][5:7] = reversed(day2[1]['programs'][5:7])         # an out-of-order day list
+    snapshot = json.dumps([day1, day2], sort_keys=True)
+
+    merged = final.merge_days([day1, day2])
+    assert json.dumps([day1, day2], sort_keys=True) == snapshot, "inputs were mutated"
+    assert [ch['channelname'] for ch in merged] == ['A', 'B', 'Tomorrow only']
+    for ch in merged:
+        starts = [p['start'] for p in ch['programs']]
+        assert starts == sorted(starts) and len(set(starts)) == len(starts), ch['channelname']
+    # Day 1 lists the carried-over show from the day before, then 24 slots; day 2 repeats the last one.
+    assert len(merged[0]['programs']) == 1 + 24 + 24
+
+    schedule = final.Schedule.from_channels(merged)
+    late_show = [piece for piece in schedule.day_programs(0, tomorrow) if piece[2].title == 'A late show']
+    assert len(late_show) == 2, late_show                     # carried in at 00:00, and again at 23:30
+    start, stop, program = late_show[0]
+    assert (start, stop) == (final.day_start_minutes(tomorrow), program.stop) and program.start < start
+    assert schedule.day_programs(0, today)[-1][1] == final.day_start_minutes(tomorrow)   # clipped at midnight
+    blocks = final.generate_program_blocks(schedule, [0], tomorrow)
+    assert 'top:0.0000%' in blocks and '23:30 - 00:30' in blocks
+    print("✅ merge fixtures: duplicates dropped, later-only channels kept, inputs untouched, midnight split")
+
+
+def benchmark_merge(num_channels=3000, num_days=2, programs_per_channel=24, repeats=5):
+    """
+    Times the original in-place merge against merge_days, each followed by the
+    parse and day render, on a large lineup. The two alternate for `repeats`
+    rounds and the best round of each is reported, as single runs on a busy
+    machine vary by more than the difference.
+    """
+    check_merge_fixtures()
+    print("\n" + "=" * 60)
+    print(f"--- Merge: {num_channels} channels x {num_days} days, overlapping responses, best of {repeats} ---")
+
+    start_date = datetime.now().date()
+    days = [start_date + timedelta(days=d) for d in range(num_days)]
+    names = [f'Channel {n}' for n in range(num_channels)]
+    channel_lists = [_day_response(day, names, programs_per_channel, late_start=True) for day in days]
+
+    def run(merge, channels):
+        started = time.perf_counter()
+        merged = merge(channels)
+        merge_time = time.perf_counter() - started
+        schedule = final.Schedule.from_channels(merged)
+        blocks = [final.generate_program_blocks(schedule, range(num_channels), day) for day in days]
+        return merge_time, time.perf_counter() - started, schedule, blocks
+
+    old_merge_time = old_time = merge_time = new_time = float('inf')
+    for _ in range(repeats):
+        # Only the last round's schedules stay alive, so neither side runs with the other's garbage around.
+        old_schedule = old_blocks = schedule = new_blocks = None
+        seconds, total, old_schedule, old_blocks = run(_old_merge, _fresh_copy(channel_lists))
+        old_merge_time, old_time = min(old_merge_time, seconds), min(old_time, total)
+        old_schedule_size, old_block_count = len(old_schedule), sum(b.count('program-block') for b in old_blocks)
+        old_schedule = old_blocks = None
+        seconds, total, schedule, new_blocks = run(final.merge_days, channel_lists)
+        merge_time, new_time = min(merge_time, seconds), min(new_time, total)
+
+    duplicates = old_schedule_size - len(schedule)
+    print(f"⏱️ merge only: in-place extend {old_merge_time:.3f}s   merge_days {merge_time:.3f}s")
+    print(f"⏱️ merge + parse + render: in-place extend {old_time:.2f}s   merge_days {new_time:.2f}s")
+    print(f"🧹 duplicate programs dropped: {duplicates}   "
+          f"rendered blocks: {old_block_count} -> "
+          f"{sum(b.count('program-block') for b in new_blocks)}")
+    return {'old_seconds': old_time, 'new_seconds': new_time,
+            'old_merge_seconds': old_merge_time, 'merge_seconds': merge_time,
+            'duplicates_dropped': duplicates}
+
+
+def _publish_page(page_html, page_name, site_dir):
+    """
+    The build-output stage the old renderers used: moves the page's inline
+    <style> and <script> into content-hashed assets, minifies the markup, and
+    writes the whole page in one call.
+    """
+    written = 0
+    urls = []
+
+    def extract(pattern, extension, minify, tag):
+        nonlocal page_html, written
+        match = re.search(pattern, page_html, flags=re.S)
+        if not match:
+            return
+        url, asset_written = final.publish_asset(minify(match.group(1)).encode('utf-8'), extension, site_dir)
+        urls.append(url)
+        written += asset_written
+        page_html = page_html[:match.start()] + tag.format(url=url) + page_html[match.end():]
+
+    extract(r'<style>(.*?)</style>', 'css', final.minify_css, '<link rel="stylesheet" href="{url}">')
+    extract(r'<script>(.*?)</script>', 'js', final.minify_js, '<script src="{url}"></script>')
+    written += final.write_site_file(os.path.join(site_dir, page_name), final.minify_html(page_html).encode('utf-8'))
+    final.prune_assets(urls, site_dir)
+    return written
+
+
+def _inline_style_page(schedule, channel_ids, days, site_dir):
+    """
+    The renderer final.py used before the streaming one: f-string blocks with
+    inline styles, every grid joined into one document string, then the whole
+    page minified and written by _publish_page.
+    """
+    grids = []
+    for n, day in enumerate(days):
+        day_start = final.day_start_minutes(day)
+        blocks = []
+        for i, channel in enumerate(channel_ids):
+            bg_color, border_color = final.COLOR_PALETTE[i % len(final.COLOR_PALETTE)]
+            for piece_start, piece_stop, prog in schedule.day_programs(channel, day):
+                style = (
+                    f'top:{((piece_start - day_start) / 1440) * 100:.4f}%; left:{i * 200}px; '
+                    f'height:{((piece_stop - piece_start) / 1440) * 100:.4f}%; width:190px;'
+                    f'background-color: {bg_color}; border-color: {border_color};'
+                )
+                description = html.escape(prog.desc if prog.desc is not None else "No description available.")
+                title = html.escape(prog.title if prog.title is not None else "Untitled Program")
+                blocks.append(
+                    f'<div class="program-block" style="{style}" data-description="{description}">'
+                    f'<span class="program-title">{title}</span>'
+                    f'<span class="program-time">{final.format_hhmm(prog.start)} - {final.format_hhmm(prog.stop)}</span>'
+                    '</div>'
+                )
+        grids.append(f'<div id="dayGrid{n}" class="schedule-grid">{"".join(blocks)}</div>')
+    page = ('<!DOCTYPE html>\n<html>\n<head>\n    <style>{css}</style>\n</head>\n<body>\n    {grids}\n'
+            '    <script>{js}</script>\n</body>\n</html>\n').format(
+        css=final.GUIDE_CSS, grids=''.join(grids), js=final.GUIDE_JAVASCRIPT)
+    return _publish_page(page, 'index.html', site_dir)
+
+
+def benchmark_render(num_days=7, slot_counts=(24, 96, 288)):
+    """
+    Renders the inline guide for the configured channels with the old
+    build-a-string renderer, the streaming one, and the streaming one with a
+    grid cache as INCREMENTAL runs it: a first run that writes the grid files,
+    then a run that copies them back. Wall time, and tracemalloc peak (which
+    should stay flat for all but the old one). 'profiles' is the whole of what
+    update_guide calls with a warm cache: render_profiles, i.e. the profile
+    view, the guide and the exports.
+    """
+    print("\n" + "=" * 60)
+    print(f"--- Render: {len(final.desired_channels)} channels x {num_days} days ---")
+
+    days = final.guide_dates(num_days)
+    profiles = [final.normalize_profile(profile) for profile in final.GUIDE_PROFILES[:1]]
+    results = {}
+    for slots in slot_counts:
+        channels = make_synthetic_guide(len(final.desired_channels), num_days, slots, start_date=days[0])
+        for channel, name in zip(channels, final.desired_channels):
+            channel['channelname'] = name
+        schedule = final.Schedule.from_channels(channels)
+        schedule.day_programs(0, days[0])  # Partition once, outside the measurements
+        channel_ids = list(range(len(channels)))
+
+        def old():
+            _inline_style_page(schedule, channel_ids, days, final.SITE_DIR)
+
+        def new():
+            final._escape.cache_clear()
+            final.create_timeline_guide(schedule, None, days)
+
+        grid_cache = {}
+
+        def first_run():
+            final._escape.cache_clear()
+            shutil.rmtree(final.GRID_CACHE_DIR, ignore_errors=True)
+            grid_cache.clear()
+            final.create_timeline_guide(schedule, grid_cache, days)
+
+        def reused():
+            final._escape.cache_clear()
+            final.create_timeline_guide(schedule, grid_cache, days)
+
+        def production():
+            final._escape.cache_clear()
+            final.render_profiles(schedule, profiles, num_days, {profiles[0]['name']: grid_cache})
+
+        row = {'programs': len(schedule)}
+        with tempfile.TemporaryDirectory() as tmp, contextlib.chdir(tmp), contextlib.redirect_stdout(io.StringIO()):
+            for name, render in (('old', old), ('streaming', new), ('grid cache', first_run), ('reused', reused),
+                                 ('profiles', production)):
+                shutil.rmtree(final.SITE_DIR, ignore_errors=True)
+                started = time.perf_counter()
+                render()
+                elapsed = time.perf_counter() - started
+                shutil.rmtree(final.SITE_DIR, ignore_errors=True)
+                tracemalloc.start()
+                render()
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                row[name] = {'seconds': elapsed, 'peak_bytes': peak,
+                             'page_bytes': os.path.getsize(os.path.join(final.SITE_DIR, 'index.html'))}
+            assert len(os.listdir(final.GRID_CACHE_DIR)) == num_days, "one grid file per day"
+        results[slots] = row
+        print(f"🖨️ {row['programs']:6} programs, page {row['old']['page_bytes'] / 1e6:5.2f} MB:")
+        for name in ('old', 'streaming', 'grid cache', 'reused', 'profiles'):
+            print(f"   {name:10} {row[name]['seconds']:.3f}s   peak {row[name]['peak_bytes'] / 1e6:6.2f} MB")
+    return results
+
+
+def benchmark_exports(num_channels=500, num_days=2, programs_per_channel=24):
+    """
+    Writes the indent=2 JSON dump and every exporter for the same schedule to
+    plain files: write time, size and gzip size. Also checks that the NDJSON,
+    XMLTV and CSV outputs hold exactly the programs the JSON does.
+    """
+    import csv
+    import xml.etree.ElementTree as ET
+
+    print("\n" + "=" * 60)
+    print(f"--- Exports: {num_channels} channels x {num_days} days ---")
+    channels = make_synthetic_guide(num_channels, num_days, programs_per_channel)
+    channels[0]['programs'][0]['title'] = 'Tom & Jerry, "Live" <special>'
+    channels[1]['channelname'], channels[2]['channelname'] = '&flix HD', 'flix HD'   # Both slug to flix-hd
+    schedule = final.Schedule.from_channels(channels)
+
+    def write_json(path):
+        with open(path, 'w', encoding='utf-8') as f:
+            final.save_schedule_json(schedule, f)
+
+    writers = {'json': write_json}
+    for files in final.EXPORTERS.values():
+        for file_name, writer in files:
+            def write(path, writer=writer):
+                with open(path, 'w', encoding='utf-8') as f:
+                    writer(schedule, f)
+            writers[file_name] = write
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, write in writers.items():
+            path = os.path.join(tmp, name.replace('json', 'dump.json') if name == 'json' else name)
+            started = time.perf_counter()
+            write(path)
+            elapsed = time.perf_counter() - started
+            with open(path, 'rb') as f:
+                data = f.read()
+            results[name] = {'seconds': elapsed, 'bytes': len(data), 'gzip_bytes': len(gzip.compress(data))}
+            print(f"📤 {name:24} {elapsed:6.3f}s   {len(data) / 1e6:6.2f} MB   gzip {results[name]['gzip_bytes'] / 1e6:5.2f} MB")
+
+        with open(os.path.join(tmp, 'dump.json'), encoding='utf-8') as f:
+            expected = [{'channelname': ch['channelname'], **p}
+                        for ch in json.load(f)['programDetailsByChannel'] for p in ch['programs']]
+        with open(os.path.join(tmp, 'tv_guide.ndjson'), encoding='utf-8') as f:
+            assert [json.loads(line) for line in f] == expected, "NDJSON differs from the JSON"
+        programmes = ET.parse(os.path.join(tmp, 'tv_guide.xml')).getroot().findall('programme')
+        assert [p.findtext('title') for p in programmes] == [p['title'] for p in expected], "XMLTV titles differ"
+        xmltv_ids = [c.get('id') for c in ET.parse(os.path.join(tmp, 'tv_guide.xml')).getroot().findall('channel')]
+        assert len(set(xmltv_ids)) == len(xmltv_ids) == num_channels, "XMLTV channel ids collide"
+        assert xmltv_ids[1:3] == ['flix-hd.in', 'flix-hd-2.in'], xmltv_ids[1:3]
+        id_of = dict(zip(schedule.channel_names, xmltv_ids))
+        assert [p.get('channel') for p in programmes] == [id_of[p['channelname']] for p in expected], "XMLTV channel refs"
+        with open(os.path.join(tmp, 'tv_guide_channels.csv'), encoding='utf-8', newline='') as f:
+            names = {row['channel_id']: row['channel_name'] for row in csv.DictReader(f)}
+        with open(os.path.join(tmp, 'tv_guide_programs.csv'), encoding='utf-8', newline='') as f:
+            rows = [(names[row['channel_id']], row['start'], row['title']) for row in csv.DictReader(f)]
+        assert rows == [(p['channelname'], p['start'][:16], p['title']) for p in expected], "CSV differs from the JSON"
+    print("✅ NDJSON, XMLTV and CSV hold the same programs as the JSON")
+    return results
+
+
+def check_profile_views(schedule):
+    """Channel-subset profile views through ScheduleIndex, in IST and in another zone (the repo has no test suite)."""
+    names = schedule.channel_names
+    subset = [names[-1], names[len(names) // 2]]
+    for zone in ('Asia/Kolkata', 'Europe/London'):
+        view = final.profile_schedule(schedule, final.normalize_profile({'channels': subset, 'timezone': zone}))
+        assert view.channel_names == [names[len(names) // 2], names[-1]], view.channel_names
+        for channel in range(len(view.channel_names)):
+            assert all(p.channel == channel for p in view.programs(channel)), f"{zone}: programs must carry the view's channel id"
+        first = view.programs(0)[0].start
+        hits = final.ScheduleIndex(view).airing_between(first, first + 24 * 60)
+        assert hits and {name for name, _ in hits} == set(subset), zone
+    assert all(p.channel == len(names) - 1 for p in schedule.programs(len(names) - 1)), "source schedule changed"
+
+    # A full IST schedule over profile_window covers every local day each profile renders.
+    zones = ('Asia/Kolkata', 'Europe/London', 'America/Los_Angeles', 'Asia/Tokyo')
+    profiles = [final.normalize_profile({'name': zone, 'path': zone, 'timezone': zone, 'channels': ['Channel 0']})
+                for zone in zones]
+    window = final.profile_window(profiles)
+    full = final.Schedule.from_channels(make_synthetic_guide(1, len(window), start_date=window[0]))
+    for profile in profiles:
+        tz = final.profile_timezone(profile)
+        view = final.profile_schedule(full, profile)
+        for day in final.guide_dates(final.GUIDE_DAYS, tz):
+            # Wall-clock minutes of the local day: 1440, or 1380/1500 on a DST switch.
+            midnights = [datetime.combine(d, datetime.min.time(), tz).astimezone(final.IST_TIMEZONE)
+                         for d in (day, day + timedelta(days=1))]
+            expected = int((midnights[1] - midnights[0]).total_seconds()) // 60
+            covered = sum(stop - start for start, stop, _ in view.day_programs(0, day))
+            assert covered == expected, f"{profile['timezone']} {day}: {covered} of {expected} minutes covered"
+    print("✅ profile views: channel subsets index and query in IST and in another zone, every local day covered")
+
+
+def benchmark_profiles(profile_counts=(1, 2, 4, 8), num_channels=300, channels_per_profile=100, latency=0.02):
+    """
+    Cost of N profiles from one scrape (fetch + parse once, then render N
+    profiles, one by one and in the process pool) against N separate scrapes.
+    The stand-in scrape has no browser login, which a real one adds per run.
+    """
+    channels_per_page = 20
+    total_pages = num_channels // channels_per_page
+    days = final.guide_dates()
+    dates = [day.strftime('%d/%m/%Y') for day in days]
+    zones = ['Asia/Kolkata', 'Asia/Dubai', 'Europe/London', 'America/New_York']
+
+    print("\n" + "=" * 60)
+    print(f"--- Profiles: {num_channels} channels x {len(days)} days, {channels_per_profile} channels per profile, "
+          f"{final.PROFILE_WORKERS} workers on {os.cpu_count()} CPU(s) ---")
+
+    with StandInEPGServer(total_pages=total_pages, channels_per_page=channels_per_page, latency=latency) as server, \
+         final.EPGClient('token', 'cookie', server.url, requests_per_second=1000) as client, \
+         contextlib.redirect_stdout(io.StringIO()):
+        started = time.perf_counter()
+        results = final.fetch_tv_guides(client, dates)
+        schedule = final.Schedule.from_channels(final.merge_days(results[date_str][0] for date_str in dates))
+        scrape_time = time.perf_counter() - started
+    names = schedule.channel_names
+    check_profile_views(schedule)
+
+    results = {'scrape_seconds': scrape_time, 'programs': len(schedule)}
+    for count in profile_counts:
+        profiles = [final.normalize_profile({
+            'name': f'p{n}', 'path': f'p{n}', 'timezone': zones[n % len(zones)],
+            'channels': [names[(n * channels_per_profile + c) % len(names)] for c in range(channels_per_profile)],
+        }) for n in range(count)]
+        row = {}
+        for label, workers in (('serial', 1), ('pool', final.PROFILE_WORKERS)):
+            with tempfile.TemporaryDirectory() as tmp, contextlib.chdir(tmp), contextlib.redirect_stdout(io.StringIO()):
+                started = time.perf_counter()
+                final.render_profiles(schedule, profiles, len(days), workers=workers)
+                row[label] = time.perf_counter() - started
+        row['one_scrape_seconds'] = scrape_time + row['pool']
+        row['separate_scrapes_seconds'] = count * scrape_time + row['serial']
+        results[count] = row
+        print(f"🎛️ {count} profile(s): render serial {row['serial']:.2f}s  pool {row['pool']:.2f}s   "
+              f"one scrape + render {row['one_scrape_seconds']:.2f}s   "
+              f"vs {count} scrape(s) {row['separate_scrapes_seconds']:.2f}s")
+    return results
+
+
+# ==============================================================================
+# --- PER-STAGE BENCHMARKS ---
+# ==============================================================================
+
+def _measure(stage):
+    """
+    Runs `stage` twice: once untraced for the wall time and once under
+    tracemalloc for the peak Python heap, so tracing does not skew the timing.
+    Returns (result of the timed run, seconds, peak bytes).
+    """
+    started = time.perf_counter()
+    result = stage()
+    seconds = time.perf_counter() - started
+    tracemalloc.start()
+    try:
+        stage()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, seconds, peak
+
+
+def benchmark_stages(total_pages=10, channels_per_page=20, latency=0.02, error_rate=0.0, fixture_dir=None,
+                     num_days=final.GUIDE_DAYS):
+    """
+    Benchmarks each stage of final.py on its own against the stand-in server:
+    credentials (the on-disk cache; the Selenium login needs the live site),
+    fetch, parse, Schedule ingest, console print, and HTML/site generation.
+    Each stage reports wall time, requests, bytes and peak memory.
+    """
+    dates = [day.strftime('%d/%m/%Y') for day in final.guide_dates(num_days)]
+    source = f"fixtures in {fixture_dir}" if fixture_dir else f"{total_pages} pages x {channels_per_page} channels"
+
+    print("\n" + "=" * 60)
+    print(f"--- Stages: {source}, {len(dates)} day(s), {latency * 1000:.0f} ms latency, "
+          f"{error_rate:.0%} injected errors ---")
+
+    stages = {}
+    with tempfile.TemporaryDirectory() as tmp, contextlib.chdir(tmp), \
+         StandInEPGServer(total_pages=total_pages, channels_per_page=channels_per_page, latency=latency,
+                          error_rate=error_rate, fixture_dir=fixture_dir) as server:
+
+        def credentials():
+            with contextlib.redirect_stdout(io.StringIO()):
+                final.save_cached_credentials('token', 'cookie', time.time() + 3600, 'credentials.json')
+                return final.load_cached_credentials('credentials.json')
+        _, seconds, peak = _measure(credentials)
+        stages['credentials'] = {'seconds': seconds, 'requests': 0, 'bytes': 0, 'peak_bytes': peak}
+
+        def fetch():
+            requests_before, bytes_before = server.request_count, server.bytes_sent
+            with final.EPGClient('token', 'cookie', server.url, requests_per_second=1000, backoff_base=0.01) as client, \
+                 contextlib.redirect_stdout(io.StringIO()):
+                results = final.fetch_tv_guides(client, dates)
+                retries = client.stats()['retries']
+            return results, server.request_count - requests_before, server.bytes_sent - bytes_before, retries
+        (results, requests, received, retries), seconds, peak = _measure(fetch)
+        failed = sum(len(failed_pages) for _, _, failed_pages in results.values())
+        stages['fetch'] = {'seconds': seconds, 'requests': requests, 'bytes': received, 'peak_bytes': peak,
+                           'retries': retries, 'failed_pages': failed}
+
+        bodies = [server.page_body(date_str, page_num) for date_str in dates
+                  for page_num in range(1, server.total_pages + 1)]
+
+        def parse():
+            for body in bodies:
+                final.parse_page_stream(
+                    (body[i:i + final.STREAM_CHUNK_SIZE] for i in range(0, len(body), final.STREAM_CHUNK_SIZE)), None)
+        _, seconds, peak = _measure(parse)
+        stages['parse'] = {'seconds': seconds, 'requests': 0, 'bytes': sum(map(len, bodies)), 'peak_bytes': peak}
+
+        channels = {}
+        for date_str in dates:
+            for channel in results[date_str][0]:
+                channels.setdefault(channel['channelname'], []).extend(channel['programs'])
+        channels = [{'channelname': name, 'programs': programs} for name, programs in channels.items()]
+        if not {ch['channelname'] for ch in channels} & set(final.desired_channels):
+            # Synthetic lineup: let the configured channels stand in for the first few.
+            for channel, name in zip(channels, final.desired_channels):
+                channel['channelname'] = name
+        schedule, seconds, peak = _measure(lambda: final.Schedule.from_channels(channels))
+        stages['schedule'] = {'seconds': seconds, 'requests': 0, 'bytes': 0, 'peak_bytes': peak,
+                              'programs': len(schedule)}
+
+        def print_all():
+            out = io.StringIO()
+            with contextlib.redirect_stdout(out):
+                for i, day in enumerate(final.guide_dates(num_days)):
+                    final.print_guide(schedule, day, final.day_label(i, day))
+            return len(out.getvalue().encode('utf-8'))
+        printed, seconds, peak = _measure(print_all)
+        stages['print'] = {'seconds': seconds, 'requests': 0, 'bytes': printed, 'peak_bytes': peak}
+
+        def render():
+            shutil.rmtree(final.SITE_DIR, ignore_errors=True)
+            with contextlib.redirect_stdout(io.StringIO()):
+                final.create_timeline_guide(schedule, None, final.guide_dates(num_days))
+            return sum(os.path.getsize(os.path.join(root, name))
+                       for root, _, names in os.walk(final.SITE_DIR) for name in names)
+        written, seconds, peak = _measure(render)
+        stages['html'] = {'seconds': seconds, 'requests': 0, 'bytes': written, 'peak_bytes': peak}
+
+    print()
+    for name, r in stages.items():
+        print(f"⏱️ {name:12} {r['seconds'] * 1000:9.1f} ms   requests: {r['requests']:4}   "
+              f"bytes: {r['bytes']:10}   peak memory: {r['peak_bytes'] / 1e6:7.2f} MB")
+    return stages
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks for final.py against a local EPG stand-in.")
+    parser.add_argument('--suite', choices=('all', 'stages'), default='all',
+                        help="'stages' runs only the per-stage benchmark")
+    parser.add_argument('--pages', type=int, default=10, help="pages per date served by the stand-in")
+    parser.add_argument('--channels-per-page', type=int, default=20)
+    parser.add_argument('--latency', type=float, default=0.02, help="seconds per request")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="share of requests answered with a 503")
+    parser.add_argument('--fixtures', help="serve the recorded pages in this directory instead of synthetic ones")
+    parser.add_argument('--record', metavar='DIR', help="record today's live pages into DIR and exit")
+    parser.add_argument('--output', default='benchmark_results.json', help="where to write the JSON results")
+    args = parser.parse_args()
+
+    if args.record:
+        record_fixtures(args.record)
+        sys.exit()
+
+    results = {
+        'config': vars(args),
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+        'stages': benchmark_stages(args.pages, args.channels_per_page, args.latency, args.error_rate, args.fixtures),
+    }
+    if args.suite == 'all':
+        results['benchmarks'] = {
+            'concurrent_fetch': benchmark_concurrent_fetch(),
+            'session_reuse': benchmark_session_reuse(),
+            'targeted_fetch': benchmark_targeted_fetch(),
+            'streaming_memory': benchmark_streaming_memory(),
+            'schedule_model': benchmark_schedule_model(),
+            'archive_lookups': benchmark_archive_lookups(),
+            'virtual_output': benchmark_virtual_output(),
+            'site_output': benchmark_site_output(),
+            'instrumentation_overhead': benchmark_instrumentation_overhead(),
+            'daemon_cycles': benchmark_daemon_cycles(),
+            'schedule_queries': benchmark_schedule_queries(),
+            'merge': benchmark_merge(),
+            'render': benchmark_render(),
+            'exports': benchmark_exports(),
+            'profiles': benchmark_profiles(),
+        }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"\n📁 Results written to {args.output}")
@@ -6,8 +6,37 @@ import json
 import time
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.common.exceptions import TimeoutException
 from datetime import datetime, timedelta, date, timezone
 import html
+import threading
+import random
+import os
+import hashlib
+import codecs
+import io
+import contextlib
+import sys
+import sqlite3
+import shutil
+import gzip
+import re
+import string
+import argparse
+from bisect import bisect_left, bisect_right
+from collections import deque
+from functools import lru_cache
+from itertools import chain, compress, count
+from operator import ge, itemgetter
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from requests.adapters import HTTPAdapter
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+try:
+    import brotli  # Optional: without it the site is published without .br files
+except ImportError:
+    brotli = None
 
 # ==============================================================================
 # --- PART 1: DISH TV SCRAPER CODE (from dish_scraper.py) ---
@@ -26,11 +55,296 @@ desired_channels = [
     "Star Movies Select HD"
 ]
 
+EPG_CHANNELS_URL = "https://www.dishtv.in/services/epg/channels"
+
+# --- GUIDE PROFILES ---
+# One scrape (of desired_channels plus every channel a profile lists) is
+# rendered once per profile, each into its own directory under SITE_DIR:
+# 'channels' is the profile's lineup (empty: desired_channels, or every
+# scraped channel when that is empty too), 'timezone' is an IANA zone the
+# times are shown in, and 'palette' is a list of (background, border)
+# colours (None: COLOR_PALETTE).
+# When PROFILES_FILE exists, its JSON list replaces GUIDE_PROFILES.
+GUIDE_PROFILES = [
+    {'name': 'default', 'channels': [], 'timezone': 'Asia/Kolkata', 'path': '', 'palette': None},
+]
+PROFILES_FILE = 'profiles.json'
+PROFILE_WORKERS = 4   # Processes rendering profiles in parallel, at most one per CPU (1: render them in this process)
+
+# --- GUIDE WINDOW CONFIGURATION ---
+IST_TIMEZONE = timezone(timedelta(hours=5, minutes=30))  # The EPG's times are IST wall-clock times
+IST_TIMEZONE_NAME = 'Asia/Kolkata'
+GUIDE_DAYS = 2    # Length of the rolling window fetched and rendered, starting with today (IST)
+JSON_OUTPUT_FILE = 'tv_guide_today_and_tomorrow.json'
+HTML_OUTPUT_FILE = 'index.html'  # The guide page in each profile's directory
+
+
+def guide_dates(num_days=GUIDE_DAYS, tz=IST_TIMEZONE):
+    """The dates of the rolling window. The guide is in IST (or `tz`), whatever timezone the runner is in."""
+    today_date = datetime.now(tz).date()
+    return [today_date + timedelta(days=offset) for offset in range(num_days)]
+
+
+def day_label(index, day):
+    if index == 0:
+        return "Today"
+    if index == 1:
+        return "Tomorrow"
+    return day.strftime('%a %d %b')
+
+# --- CONCURRENCY CONFIGURATION ---
+MAX_CONCURRENT_REQUESTS = 4   # How many pages (across all dates) are in flight at once
+REQUESTS_PER_SECOND = 2.0     # Token-bucket refill rate (replaces the old flat 0.5s sleep)
+REQUEST_BURST = 4             # How many requests may go out back-to-back before throttling kicks in
+
+# --- RETRY CONFIGURATION ---
+MAX_RETRIES = 3               # Extra attempts per page after a 5xx or a timeout
+RETRY_BACKOFF_BASE = 1.0      # Seconds; attempt N waits up to base * 2**N (full jitter)
+RETRY_BACKOFF_MAX = 15.0      # Upper bound for a single backoff sleep
+REQUEST_TIMEOUT = 20
+STREAM_CHUNK_SIZE = 64 * 1024  # Bytes read from the response at a time while parsing a page
+
+# --- CREDENTIAL CACHE CONFIGURATION ---
+CACHE_DIR = '.cache'
+CREDENTIALS_CACHE_FILE = os.path.join(CACHE_DIR, 'credentials.json')
+CREDENTIALS_DEFAULT_TTL = 6 * 3600   # Seconds to trust credentials whose token cookie has no expiry
+CREDENTIALS_WAIT_TIMEOUT = 30        # Seconds to wait for the token cookie to appear in the browser
+
+# --- INCREMENTAL SCRAPE CONFIGURATION ---
+INCREMENTAL = True                   # Reuse unchanged pages/days from the previous run and skip unchanged output
+REUSE_TOMORROW_AFTER_MIDNIGHT = True # Use yesterday's "tomorrow" as today's data once, instead of refetching it
+SCRAPE_STATE_FILE = os.path.join(CACHE_DIR, 'scrape_state.json')
+GRID_CACHE_DIR = os.path.join(CACHE_DIR, 'grids')  # Rendered day grids, one file per grid, named by its cache key
+
+# --- ARCHIVE CONFIGURATION ---
+ARCHIVE_FILE = os.path.join(CACHE_DIR, 'schedule_archive.sqlite3')
+ARCHIVE_RETENTION_DAYS = 14          # Past days kept in the archive before compaction drops them
+ARCHIVE_VACUUM_FREE_RATIO = 0.25     # VACUUM once this share of the database file is free pages
+
+# --- TARGETED FETCH CONFIGURATION ---
+TARGETED_FETCH = True    # Drop unwanted channels while parsing and stop paginating once all are found
+CHANNEL_INDEX_FILE = os.path.join(CACHE_DIR, 'channel_page_index.json')
+CHANNEL_GENRE = ''       # Sent as the 'channelgenre' form field; narrows the lineup server-side when set
+CHANNEL_LANGUAGE = ''    # Sent as the 'language' form field; narrows the lineup server-side when set
+
+# --- DAEMON CONFIGURATION (python final.py --serve) ---
+SERVE_HOST = '127.0.0.1'
+SERVE_PORT = 8000
+SERVE_INTERVAL = 3600                # Seconds between updates
+SERVE_JITTER = 300                   # Each wait is SERVE_INTERVAL +/- up to this many seconds
+CREDENTIALS_REFRESH_MARGIN = 300     # Refresh credentials this many seconds before they expire
+
+# --- RUN REPORT CONFIGURATION ---
+METRICS_ENABLED = True               # Record spans/counters/histograms for the run (near-free when False)
+RUN_REPORT_FILE = 'run_report.json'  # Written at the end of every run when metrics are enabled
+PROMETHEUS_TEXTFILE = ''             # e.g. '/var/lib/node_exporter/textfile_collector/tv_guide.prom'; '' = off
+
+# --- RUN METRICS ---
+class _Span:
+    """One timed stage. Use through RunMetrics.span(); extra attributes can be added with set()."""
+    __slots__ = ('metrics', 'name', 'attrs', 'parent', 'started')
+
+    def __init__(self, metrics, name, attrs):
+        self.metrics = metrics
+        self.name = name
+        self.attrs = attrs
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        stack = self.metrics._stack()
+        self.parent = stack[-1] if stack else None
+        stack.append(self.name)
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        ended = time.perf_counter()
+        self.metrics._stack().pop()
+        record = {
+            'name': self.name,
+            'parent': self.parent,
+            'thread': threading.current_thread().name,
+            'start_ms': round((self.started - self.metrics.started_perf) * 1000, 3),
+            'duration_ms': round((ended - self.started) * 1000, 3),
+        }
+        if self.attrs:
+            record['attrs'] = self.attrs
+        if exc_type is not None:
+            record['error'] = exc_type.__name__
+        with self.metrics._lock:
+            self.metrics.spans.append(record)
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def set(self, **attrs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+_NO_SPAN = _NoSpan()
+
+
+class RunMetrics:
+    """
+    Structured telemetry for one run: nested timing spans, counters, gauges
+    and fixed-bucket histograms, safe to update from the fetch worker threads.
+    Written out at the end of the run as RUN_REPORT_FILE and, optionally, a
+    Prometheus textfile for node_exporter.
+
+    When disabled, span() hands back one shared no-op object and the other
+    methods return immediately, so the instrumentation stays in place for free.
+    """
+    LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+    SIZE_BUCKETS = (1e3, 1e4, 1e5, 1e6, 1e7)
+
+    def __init__(self, enabled=METRICS_ENABLED):
+        self.enabled = enabled
+        self.started_at = time.time()
+        self.started_perf = time.perf_counter()
+        self.spans = []
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def span(self, name, **attrs):
+        if not self.enabled:
+            return _NO_SPAN
+        return _Span(self, name, attrs)
+
+    def count(self, name, value=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def gauge(self, name, value):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.gauges[name] = value
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS):
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = {
+                    'buckets': list(buckets), 'counts': [0] * (len(buckets) + 1), 'count': 0, 'sum': 0, 'max': 0,
+                }
+            histogram['counts'][bisect_left(histogram['buckets'], value)] += 1
+            histogram['count'] += 1
+            histogram['sum'] += value
+            histogram['max'] = max(histogram['max'], value)
+
+    def stage_totals(self):
+        """Total milliseconds and number of spans per span name."""
+        totals = {}
+        for span in self.spans:
+            total = totals.setdefault(span['name'], {'count': 0, 'total_ms': 0.0})
+            total['count'] += 1
+            total['total_ms'] = round(total['total_ms'] + span['duration_ms'], 3)
+        return totals
+
+    def report(self):
+        with self._lock:
+            return {
+                'started_at': datetime.fromtimestamp(self.started_at).isoformat(timespec='seconds'),
+                'duration_ms': round((time.perf_counter() - self.started_perf) * 1000, 3),
+                'stages': self.stage_totals(),
+                'counters': dict(self.counters),
+                'gauges': dict(self.gauges),
+                'histograms': {name: dict(h) for name, h in self.histograms.items()},
+                'spans': sorted(self.spans, key=lambda span: span['start_ms']),
+            }
+
+    def write_report(self, path=RUN_REPORT_FILE):
+        if not self.enabled or not path:
+            return
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, indent=2, ensure_ascii=False)
+        print(f"📈 Run report written to {path}")
+
+    def write_prometheus(self, path=PROMETHEUS_TEXTFILE, prefix='tv_guide'):
+        """Writes the run in the Prometheus text format, atomically (node_exporter may read it at any time)."""
+        if not self.enabled or not path:
+            return
+        report = self.report()
+        lines = [f"{prefix}_last_run_timestamp_seconds {self.started_at:.0f}",
+                 f"{prefix}_run_duration_seconds {report['duration_ms'] / 1000:.3f}"]
+        for name, total in report['stages'].items():
+            lines.append(f'{prefix}_stage_duration_seconds{{stage="{name}"}} {total["total_ms"] / 1000:.3f}')
+            lines.append(f'{prefix}_stage_spans{{stage="{name}"}} {total["count"]}')
+        for name, value in report['counters'].items():
+            lines.append(f"{prefix}_{name}_total {value}")
+        for name, value in report['gauges'].items():
+            lines.append(f"{prefix}_{name} {value}")
+        for name, h in report['histograms'].items():
+            lines.append(f"# TYPE {prefix}_{name} histogram")
+            cumulative = 0
+            for bound, count in zip(h['buckets'] + ['+Inf'], h['counts']):
+                cumulative += count
+                lines.append(f'{prefix}_{name}_bucket{{le="{bound}"}} {cumulative}')
+            lines.append(f"{prefix}_{name}_sum {h['sum']}")
+            lines.append(f"{prefix}_{name}_count {h['count']}")
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.replace(path + '.tmp', path)
+        print(f"📈 Prometheus metrics written to {path}")
+
+
+metrics = RunMetrics()
+
+# --- RATE LIMITING ---
+class TokenBucket:
+    """
+    Thread-safe token bucket. Every request takes one token; tokens refill at
+    `rate` per second up to `capacity`, so short bursts are allowed but the
+    long-run request rate never exceeds `rate`.
+    """
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
 # --- SCRAPER FUNCTIONS ---
 def get_fresh_credentials():
     """
     Uses Selenium to open the Dish TV guide page and grab fresh credentials.
     (This function is MODIFIED to work on GitHub Actions)
+    Returns (auth_token, cookie_string, expires_at), where expires_at is a Unix
+    timestamp taken from the token cookie when it carries one.
     """
     print("🤖 Starting automated browser to get fresh credentials...")
     
@@ -43,19 +357,25 @@ def get_fresh_credentials():
     
     auth_token = None
     cookie_string = ""
+    expires_at = None
 
     try:
         driver.get("https://www.dishtv.in/channel-guide.html")
         print("   Page loaded, waiting for token generation...")
-        time.sleep(10) 
-        
-        token_cookie = driver.get_cookie('channelguidetoken')
+        try:
+            token_cookie = WebDriverWait(driver, CREDENTIALS_WAIT_TIMEOUT, poll_frequency=0.25).until(
+                lambda d: d.get_cookie('channelguidetoken')
+            )
+        except TimeoutException:
+            token_cookie = None
+
         if token_cookie:
             auth_token = token_cookie['value']
+            expires_at = token_cookie.get('expiry')
             print("   ✅ Authorization token found!")
         else:
-            print("   ❌ Could not find 'channelguidetoken' cookie.")
-            return None, None
+            print(f"   ❌ Could not find 'channelguidetoken' cookie after {CREDENTIALS_WAIT_TIMEOUT}s.")
+            return None, None, None
 
         all_cookies = driver.get_cookies()
         cookie_string = "; ".join([f"{cookie['name']}={cookie['value']}" for cookie in all_cookies])
@@ -63,21 +383,157 @@ def get_fresh_credentials():
 
     except Exception as e:
         print(f"   Error during browser automation: {e}")
-        return None, None
+        return None, None, None
     finally:
         driver.quit()
         print("   Browser closed.")
     
-    return auth_token, cookie_string
+    return auth_token, cookie_string, expires_at
 
 
-def fetch_tv_guide(auth_token, cookie_string, target_date_str):
+def load_cached_credentials(cache_file=CREDENTIALS_CACHE_FILE):
     """
-    Uses the fresh credentials to fetch the entire TV guide for a specific date.
+    Returns (auth_token, cookie_string) from the on-disk cache, or (None, None)
+    if there is no cache or the cached credentials have expired.
     """
-    REQUEST_URL = "https://www.dishtv.in/services/epg/channels"
-    
-    headers = {
+    try:
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None, None
+
+    if cached.get('expires_at', 0) <= time.time():
+        print("🔑 Cached credentials have expired.")
+        return None, None
+    return cached.get('auth_token'), cached.get('cookie_string')
+
+
+def cached_credentials_expiry(cache_file=CREDENTIALS_CACHE_FILE):
+    """Unix time at which the cached credentials expire (0 if there are none)."""
+    try:
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            return json.load(f).get('expires_at', 0)
+    except (OSError, ValueError):
+        return 0
+
+
+def save_cached_credentials(auth_token, cookie_string, expires_at=None, cache_file=CREDENTIALS_CACHE_FILE):
+    if not expires_at:
+        expires_at = time.time() + CREDENTIALS_DEFAULT_TTL
+    os.makedirs(os.path.dirname(cache_file) or '.', exist_ok=True)
+    with open(cache_file, 'w', encoding='utf-8') as f:
+        json.dump({'auth_token': auth_token, 'cookie_string': cookie_string, 'expires_at': expires_at}, f)
+    print(f"🔑 Credentials cached until {datetime.fromtimestamp(expires_at).strftime('%Y-%m-%d %H:%M:%S')}.")
+
+
+def clear_cached_credentials(cache_file=CREDENTIALS_CACHE_FILE):
+    try:
+        os.remove(cache_file)
+    except FileNotFoundError:
+        pass
+
+
+def get_credentials(force_refresh=False):
+    """
+    Returns (auth_token, cookie_string, from_cache). Cached credentials are used
+    while they are still valid; otherwise the browser is started and the cache
+    is refreshed.
+    """
+    with metrics.span('credentials', force_refresh=force_refresh) as span:
+        if not force_refresh:
+            auth_token, cookie_string = load_cached_credentials()
+            if auth_token and cookie_string:
+                print("🔑 Using cached credentials, skipping the browser.")
+                span.set(from_cache=True)
+                return auth_token, cookie_string, True
+
+        with metrics.span('credentials.browser'):
+            auth_token, cookie_string, expires_at = get_fresh_credentials()
+        metrics.count('browser_logins')
+        if auth_token and cookie_string:
+            save_cached_credentials(auth_token, cookie_string, expires_at)
+        span.set(from_cache=False, ok=bool(auth_token and cookie_string))
+        return auth_token, cookie_string, False
+
+
+# --- INCREMENTAL STATE ---
+def content_hash(obj):
+    return hashlib.sha1(json.dumps(obj, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+class ScrapeState:
+    """
+    What the previous run saw, persisted between runs in SCRAPE_STATE_FILE:
+
+    - pages:          per (date, page) validators (ETag / Last-Modified), the payload
+                      hash and the kept channels, so a 304 needs no body at all
+    - channel_hashes: per date, a hash of each channel's programs
+    - days:           the filtered channels of each date and the role it was fetched as
+                      ('today', or 'ahead' for the later days of the window)
+    - output_hash:    hash of everything the last written JSON/HTML was built from
+    - day_grids:      per profile and day, the cache key of the rendered grid kept in GRID_CACHE_DIR
+
+    Page lookups happen on fetch worker threads, so page access is locked.
+    """
+    def __init__(self, path=SCRAPE_STATE_FILE):
+        self.path = path
+        self.data = {'pages': {}, 'channel_hashes': {}, 'days': {}, 'output_hash': None, 'day_grids': {}}
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                self.data.update(json.load(f))
+        except (OSError, ValueError):
+            pass
+        self.pages_skipped = 0
+        self.pages_changed = 0
+        self._lock = threading.Lock()
+
+    def get_page(self, target_date_str, page_num):
+        with self._lock:
+            return self.data['pages'].get(f"{target_date_str}|{page_num}")
+
+    def put_page(self, target_date_str, page_num, entry):
+        with self._lock:
+            self.data['pages'][f"{target_date_str}|{page_num}"] = entry
+            self.pages_changed += 1
+
+    def mark_page_skipped(self):
+        with self._lock:
+            self.pages_skipped += 1
+
+    def compare_channels(self, target_date_str, channels):
+        """
+        Records the per-channel hashes for a date and returns
+        (unchanged_count, changed_count) against the previous run.
+        """
+        previous = self.data['channel_hashes'].get(target_date_str, {})
+        current = {ch.get('channelname'): content_hash(ch.get('programs', [])) for ch in channels}
+        unchanged = sum(1 for name, digest in current.items() if previous.get(name) == digest)
+        self.data['channel_hashes'][target_date_str] = current
+        return unchanged, len(current) - unchanged
+
+    def get_day(self, target_date_str):
+        return self.data['days'].get(target_date_str)
+
+    def put_day(self, target_date_str, channels, role):
+        self.data['days'][target_date_str] = {'role': role, 'channels': channels}
+
+    def prune(self, keep_date_strs):
+        """Forgets every date that is no longer part of the guide."""
+        keep = set(keep_date_strs)
+        self.data['pages'] = {k: v for k, v in self.data['pages'].items() if k.split('|')[0] in keep}
+        for section in ('channel_hashes', 'days'):
+            self.data[section] = {k: v for k, v in self.data[section].items() if k in keep}
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+
+def build_epg_headers(auth_token, cookie_string):
+    return {
         'accept': '*/*',
         'accept-language': 'en-US,en;q=0.9',
         'authorization-token': auth_token,
@@ -86,57 +542,527 @@ def fetch_tv_guide(auth_token, cookie_string, target_date_str):
         'user-agent': 'Mozilla/5.0 (Linux; Android 13; SM-G981B) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/140.0.0.0 Mobile Safari/537.36',
         'cookie': cookie_string
     }
-    
-    all_channels = []
-    total_pages = 1
 
-    try:
-        print(f"\n📡 Fetching page 1 for {target_date_str} to get total page count...")
-        form_data_page_1 = {
-            'channelgenre': '', 'language': '', 'allowPastEvents': 'true',
-            'dataSize': 'large', 'pageNum': '1', 'date': target_date_str
-        }
-        response = requests.post(REQUEST_URL, headers=headers, files=form_data_page_1, timeout=20)
-
-        if response.status_code == 200:
-            data = response.json()
-            total_pages = int(data.get('totalPages', 1))
-            print(f"✅ Success! Total pages found: {total_pages}")
-            
-            page_1_channels = data.get('programDetailsByChannel', [])
-            all_channels.extend(page_1_channels)
-            print(f"   Collected {len(page_1_channels)} channels from page 1.")
-        else:
-            print(f"Error fetching page 1: {response.status_code}")
-            print(response.text)
-            return None, None
-
-        for page_num in range(2, total_pages + 1):
-            print(f"Fetching page {page_num} of {total_pages}...")
-            form_data_current_page = form_data_page_1.copy()
-            form_data_current_page['pageNum'] = str(page_num)
-            
+
+def build_page_form_data(target_date_str, page_num, channel_genre='', language=''):
+    return {
+        'channelgenre': channel_genre, 'language': language, 'allowPastEvents': 'true',
+        'dataSize': 'large', 'pageNum': str(page_num), 'date': target_date_str
+    }
+
+
+class ChannelPageIndex:
+    """
+    Remembers which page each wanted channel was last seen on, separately for
+    each genre/language filter, so the next run can request those pages first
+    and usually stop right after them.
+    """
+    def __init__(self, path=CHANNEL_INDEX_FILE, channel_genre=CHANNEL_GENRE, language=CHANNEL_LANGUAGE):
+        self.path = path
+        self.scope = f"{channel_genre}|{language}"
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                self.data = json.load(f)
+        except (OSError, ValueError):
+            self.data = {}
+        self.pages = self.data.setdefault(self.scope, {})
+        self._lock = threading.Lock()
+
+    def pages_for(self, channel_names):
+        with self._lock:
+            return sorted({self.pages[name] for name in channel_names if name in self.pages})
+
+    def record(self, page_num, channels):
+        with self._lock:
+            for ch in channels:
+                self.pages[ch.get('channelname')] = page_num
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump(self.data, f, ensure_ascii=False)
+
+
+# --- STREAMING PAGE PARSER ---
+_JSON_DECODER = json.JSONDecoder()
+_JSON_WHITESPACE = ' \t\n\r'
+PROGRAM_FIELDS = ('title', 'desc', 'start', 'stop')
+
+
+class StreamingJSONPage:
+    """
+    Incrementally parses one EPG page (a JSON object) from an iterator of byte
+    chunks. Iterating yields the entries of the `programDetailsByChannel` array
+    one at a time as soon as each is complete, so the page body is never held
+    whole; every other top-level field (e.g. totalPages) is collected in `fields`.
+    """
+    def __init__(self, chunks, array_key='programDetailsByChannel'):
+        self.array_key = array_key
+        self.fields = {}
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self._buf = ''
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self):
+        """Appends the next chunk to the buffer, dropping text that was already consumed."""
+        if self._eof:
+            return False
+        chunk = next(self._chunks, None)
+        self._buf = self._buf[self._pos:]
+        self._pos = 0
+        if chunk is None:
+            self._eof = True
+            self._buf += self._decoder.decode(b'', final=True)
+            return False
+        self._buf += self._decoder.decode(chunk)
+        return True
+
+    def _peek(self):
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in _JSON_WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                raise ValueError("Unexpected end of JSON page")
+
+    def _take(self, expected):
+        char = self._peek()
+        if char not in expected:
+            raise ValueError(f"Expected one of {expected!r} in JSON page, got {char!r}")
+        self._pos += 1
+        return char
+
+    def _value(self):
+        self._peek()
+        while True:
             try:
-                response = requests.post(REQUEST_URL, headers=headers, files=form_data_current_page, timeout=20)
-                if response.status_code == 200:
-                    data = response.json()
-                    new_channels = data.get('programDetailsByChannel', [])
-                    all_channels.extend(new_channels)
-                    print(f"   Collected {len(new_channels)} channels. Total so far: {len(all_channels)}")
+                value, end = _JSON_DECODER.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # A number that ends exactly at the buffer edge may continue in the next chunk.
+            if end == len(self._buf) and self._fill():
+                continue
+            self._pos = end
+            return value
+
+    def __iter__(self):
+        self._take('{')
+        if self._peek() == '}':
+            self._pos += 1
+        else:
+            while True:
+                key = self._value()
+                self._take(':')
+                if key == self.array_key and self._peek() == '[':
+                    self._pos += 1
+                    if self._peek() == ']':
+                        self._pos += 1
+                    else:
+                        while True:
+                            yield self._value()
+                            if self._take(',]') == ']':
+                                break
                 else:
-                    print(f"   Could not fetch page {page_num}. Status: {response.status_code}")
-                time.sleep(0.5)
+                    self.fields[key] = self._value()
+                if self._take(',}') == '}':
+                    break
+        # Read whatever is left so the connection can go back to the pool.
+        for _ in self._chunks:
+            pass
+
+
+def normalize_channel(channel):
+    """Keeps only the fields the guide uses, so unused per-channel metadata is not carried around."""
+    return {
+        'channelname': channel.get('channelname'),
+        'programs': [
+            {field: program[field] for field in PROGRAM_FIELDS if field in program}
+            for program in channel.get('programs') or []
+        ],
+    }
+
+
+def parse_page_stream(chunks, wanted_channels=None):
+    """
+    Streams a page body into {'totalPages': ..., 'programDetailsByChannel': [...]}.
+    Channels are filtered and normalized one at a time as they are parsed, so
+    unwanted channels never accumulate. Returns (page, sha1 hex digest of the body).
+    """
+    digest = hashlib.sha1()
+
+    def hashed():
+        for chunk in chunks:
+            digest.update(chunk)
+            yield chunk
+
+    page = StreamingJSONPage(hashed())
+    channels = [
+        normalize_channel(ch) for ch in page
+        if not wanted_channels or ch.get('channelname') in wanted_channels
+    ]
+    return dict(page.fields, programDetailsByChannel=channels), digest.hexdigest()
+
+
+class EPGRequestError(RuntimeError):
+    """Raised when a page could not be fetched, after any retries."""
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class CredentialsRejectedError(EPGRequestError):
+    """Raised when the endpoint answers 401/403, i.e. the token or cookies are no longer accepted."""
+
+
+class EPGClient:
+    """
+    Client for the EPG endpoint. Owns a single pooled `requests.Session`, so
+    every page reuses keep-alive connections and the header dict is attached
+    once instead of per request. Failed pages (5xx, timeouts, dropped
+    connections) are retried with exponential backoff and full jitter.
+
+    Counters (`request_count`, `retry_count`, `bytes_received` and running
+    latency count/total/max) are updated from worker threads under a lock and
+    can be read with `stats()` in constant time, however long the client lives.
+    """
+    def __init__(self, auth_token, cookie_string, request_url=None,
+                 max_concurrent=MAX_CONCURRENT_REQUESTS, requests_per_second=REQUESTS_PER_SECOND,
+                 burst=REQUEST_BURST, max_retries=MAX_RETRIES, backoff_base=RETRY_BACKOFF_BASE,
+                 backoff_max=RETRY_BACKOFF_MAX, timeout=REQUEST_TIMEOUT,
+                 channel_genre=CHANNEL_GENRE, language=CHANNEL_LANGUAGE):
+        self.request_url = request_url or EPG_CHANNELS_URL
+        self.channel_genre = channel_genre
+        self.language = language
+        self.max_concurrent = max_concurrent
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.rate_limiter = TokenBucket(requests_per_second, burst)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrent)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update(build_epg_headers(auth_token, cookie_string))
+
+        self.request_count = 0
+        self.retry_count = 0
+        self.bytes_received = 0
+        self.latency_count = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self._stats_lock = threading.Lock()
+
+    def set_credentials(self, auth_token, cookie_string):
+        """Swaps in refreshed credentials without dropping the pooled connections."""
+        self.session.headers.update(build_epg_headers(auth_token, cookie_string))
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _record(self, latency, num_bytes):
+        with self._stats_lock:
+            self.request_count += 1
+            self.bytes_received += num_bytes
+            self.latency_count += 1
+            self.latency_total += latency
+            self.latency_max = max(self.latency_max, latency)
+        metrics.count('requests')
+        metrics.count('response_bytes', num_bytes)
+        metrics.observe('request_latency_seconds', latency, RunMetrics.LATENCY_BUCKETS)
+        metrics.observe('response_size_bytes', num_bytes, RunMetrics.SIZE_BUCKETS)
+
+    def _backoff(self, attempt):
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def post(self, form_data, headers=None, consume=None):
+        """
+        POSTs one form to the endpoint, retrying 5xx responses, timeouts and
+        connections dropped mid-body. A 200 body is streamed through
+        `consume(chunks)` (by default it is just read into bytes); a 304 to a
+        conditional request has no body and yields None.
+        Returns (response, consumed body), or raises EPGRequestError.
+        """
+        if consume is None:
+            consume = b''.join
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire()
+            started = time.perf_counter()
+            received = 0
+
+            def counted_chunks(response):
+                nonlocal received
+                for chunk in response.iter_content(STREAM_CHUNK_SIZE):
+                    received += len(chunk)
+                    yield chunk
+
+            try:
+                with self.session.post(self.request_url, files=form_data, headers=headers,
+                                       timeout=self.timeout, stream=True) as response:
+                    if response.status_code == 200:
+                        body = consume(counted_chunks(response))
+                        self._record(time.perf_counter() - started, received)
+                        return response, body
+                    received = len(response.content)
+                self._record(time.perf_counter() - started, received)
+                if response.status_code == 304 and headers:
+                    return response, None
+                if response.status_code in (401, 403):
+                    raise CredentialsRejectedError(f"Status: {response.status_code}", response.status_code)
+                error = EPGRequestError(f"Status: {response.status_code}", response.status_code)
+                if response.status_code < 500:
+                    raise error
+            except (requests.Timeout, requests.ConnectionError, requests.exceptions.ChunkedEncodingError) as e:
+                self._record(time.perf_counter() - started, received)
+                error = EPGRequestError(f"{type(e).__name__}: {e}")
+
+            if attempt == self.max_retries:
+                raise error
+            with self._stats_lock:
+                self.retry_count += 1
+            metrics.count('retries')
+            time.sleep(self._backoff(attempt))
+
+    def fetch_page(self, target_date_str, page_num, state=None, wanted_channels=None):
+        """
+        Fetches a single page of the guide, parsing it as it streams in. With
+        `wanted_channels`, every other channel is dropped as soon as it is parsed.
+        With a ScrapeState, the previous run's validators are sent as conditional
+        headers and a 304 returns the cached page; a byte-identical payload is
+        counted as unchanged.
+        """
+        with metrics.span('fetch_page', date=target_date_str, page=page_num) as span:
+            form_data = build_page_form_data(target_date_str, page_num, self.channel_genre, self.language)
+            consume = lambda chunks: parse_page_stream(chunks, wanted_channels)
+            if state is None:
+                _, (data, _) = self.post(form_data, consume=consume)
+                return data
+
+            filter_key = content_hash(sorted(wanted_channels)) if wanted_channels else None
+            cached = state.get_page(target_date_str, page_num)
+            if cached and cached.get('filter') != filter_key:
+                cached = None
+            conditional_headers = {}
+            if cached and cached.get('etag'):
+                conditional_headers['If-None-Match'] = cached['etag']
+            if cached and cached.get('last_modified'):
+                conditional_headers['If-Modified-Since'] = cached['last_modified']
+
+            response, body = self.post(form_data, headers=conditional_headers or None, consume=consume)
+            if response.status_code == 304:
+                state.mark_page_skipped()
+                span.set(not_modified=True)
+                return cached['data']
+
+            data, digest = body
+            if cached and cached.get('hash') == digest:
+                state.mark_page_skipped()
+                span.set(unchanged=True)
+                return cached['data']
+
+            state.put_page(target_date_str, page_num, {
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+                'hash': digest,
+                'filter': filter_key,
+                'data': data,
+            })
+            return data
+
+    def stats(self):
+        with self._stats_lock:
+            count = self.latency_count
+            return {
+                'requests': self.request_count,
+                'retries': self.retry_count,
+                'bytes_received': self.bytes_received,
+                'latency_avg_ms': round(1000 * self.latency_total / count, 1) if count else 0,
+                'latency_max_ms': round(1000 * self.latency_max, 1) if count else 0,
+            }
+
+
+def fetch_tv_guide(client, target_date_str, executor=None, state=None, wanted_channels=None, channel_index=None):
+    """
+    Uses the client's credentials to fetch the TV guide for a specific date.
+    The first page is fetched on its own to learn the page count; the remaining
+    pages are then fetched concurrently on `executor` and reassembled in page order.
+
+    With `wanted_channels` (targeted mode), other channels are dropped as each
+    page is parsed, pages that `channel_index` says hold a wanted channel are
+    fetched first, and no further pages are requested once every wanted channel
+    has been seen.
+    Returns (all_channels, total_pages, failed_pages).
+    """
+    wanted = set(wanted_channels) if wanted_channels else None
+    channels_by_page = {}
+    found_channels = set()
+    failed_pages = []
+
+    def collect(page_num, data):
+        channels = data.get('programDetailsByChannel', [])
+        channels_by_page[page_num] = channels
+        found_channels.update(ch.get('channelname') for ch in channels)
+        if channel_index is not None:
+            channel_index.record(page_num, channels)
+        return channels
+
+    def all_wanted_found():
+        return wanted is not None and wanted <= found_channels
+
+    owns_executor = executor is None
+    if owns_executor:
+        executor = ThreadPoolExecutor(max_workers=client.max_concurrent)
+
+    try:
+        indexed_pages = channel_index.pages_for(wanted) if wanted and channel_index is not None else []
+        first_page = indexed_pages[0] if indexed_pages else 1
+        print(f"\n📡 Fetching page {first_page} for {target_date_str} to get total page count...")
+        try:
+            # Through the shared pool as well, so first pages count against max_concurrent too.
+            data = executor.submit(client.fetch_page, target_date_str, first_page, state, wanted).result()
+        except CredentialsRejectedError:
+            raise
+        except EPGRequestError as e:
+            print(f"Error fetching page {first_page}: {e}")
+            return None, None, None
+
+        total_pages = int(data.get('totalPages', 1))
+        print(f"✅ Success! Total pages found: {total_pages}")
+        first_channels = collect(first_page, data)
+        print(f"   Collected {len(first_channels)} channels from page {first_page}.")
+
+        # Indexed pages first, then everything else in order. Only a window of
+        # max_concurrent pages is in flight, so an early stop wastes few requests.
+        # If the index knows every wanted channel, only its pages are requested
+        # until they turn out not to be enough.
+        indexed_rest = [p for p in indexed_pages[1:] if p <= total_pages]
+        page_order = indexed_rest + [p for p in range(1, total_pages + 1) if p != first_page and p not in indexed_pages]
+        next_pages = iter(page_order)
+        in_flight = deque()
+        index_covers_all = wanted is not None and channel_index is not None and \
+            all(name in channel_index.pages for name in wanted)
+        scanning = not (index_covers_all and indexed_rest)
+
+        def submit(page_num):
+            in_flight.append((page_num, executor.submit(client.fetch_page, target_date_str, page_num, state, wanted)))
+
+        def top_up():
+            while len(in_flight) < client.max_concurrent:
+                page_num = next(next_pages, None)
+                if page_num is None:
+                    return
+                submit(page_num)
+
+        if not all_wanted_found():
+            if scanning:
+                top_up()
+            else:
+                for _ in indexed_rest:
+                    submit(next(next_pages))
+
+        while in_flight:
+            page_num, future = in_flight.popleft()
+            try:
+                new_channels = collect(page_num, future.result())
+                print(f"   [{target_date_str}] Page {page_num} of {total_pages}: collected {len(new_channels)} channels.")
+            except CredentialsRejectedError:
+                for _, pending in in_flight:
+                    pending.cancel()
+                raise
             except Exception as e:
-                print(f"   An error occurred on page {page_num}: {e}")
-        
-        return all_channels, total_pages
+                failed_pages.append(page_num)
+                print(f"   Could not fetch page {page_num} for {target_date_str}. {e}")
 
+            if all_wanted_found():
+                for _, pending in in_flight:
+                    pending.cancel()
+                print(f"🎯 All {len(wanted)} wanted channels found for {target_date_str} "
+                      f"after {len(channels_by_page) + len(failed_pages)} of {total_pages} pages.")
+                break
+            if not in_flight:
+                # The indexed pages were not enough: scan the rest.
+                scanning = True
+            if scanning:
+                top_up()
+
+        # Pages are reassembled in page order so the channel list keeps the server's ordering.
+        all_channels = [ch for page_num in sorted(channels_by_page) for ch in channels_by_page[page_num]]
+        print(f"   [{target_date_str}] Total channels collected: {len(all_channels)}")
+        if wanted is not None and not all_wanted_found():
+            print(f"⚠️ Wanted channels not found for {target_date_str}: {sorted(wanted - found_channels)}")
+        if failed_pages:
+            print(f"⚠️ {len(failed_pages)} page(s) failed for {target_date_str}: {sorted(failed_pages)}")
+        return all_channels, total_pages, sorted(failed_pages)
+
+    except CredentialsRejectedError:
+        raise
     except Exception as e:
         print(f"A critical error occurred during fetching: {e}")
-        return None, None
+        return None, None, None
+    finally:
+        if owns_executor:
+            executor.shutdown(wait=True)
 
-def print_guide(all_channels, day_label):
-    if not all_channels:
+
+def fetch_tv_guides(client, target_date_strs, state=None, wanted_channels=None, channel_index=None):
+    """
+    Fetches several dates at once. All dates share one bounded page pool and the
+    client's token bucket, so the total number of in-flight requests and the
+    request rate stay within the configured limits no matter how many dates are
+    requested. Returns {date_str: (all_channels, total_pages, failed_pages)}.
+    """
+    def fetch_date(date_str):
+        with metrics.span('fetch_date', date=date_str) as span:
+            result = fetch_tv_guide(client, date_str, page_pool, state, wanted_channels, channel_index)
+            channels, total_pages, failed_pages = result
+            span.set(total_pages=total_pages, channels=len(channels or []), failed_pages=len(failed_pages or []))
+            return result
+
+    with ThreadPoolExecutor(max_workers=client.max_concurrent) as page_pool, \
+         ThreadPoolExecutor(max_workers=max(1, len(target_date_strs))) as date_pool:
+        futures = {date_str: date_pool.submit(fetch_date, date_str) for date_str in target_date_strs}
+        return {date_str: future.result() for date_str, future in futures.items()}
+
+
+def fetch_tv_guides_with_credentials(target_date_strs, state=None, wanted_channels=None, channel_index=None):
+    """
+    Gets credentials (from the cache when possible) and fetches all dates. If
+    the endpoint rejects cached credentials, the browser is started once to
+    refresh them and the fetch is retried. Returns the fetch_tv_guides() result,
+    or None if no working credentials could be obtained.
+    """
+    token, cookies, from_cache = get_credentials()
+    while token and cookies:
+        try:
+            with EPGClient(token, cookies) as client, metrics.span('fetch', dates=len(target_date_strs)):
+                results = fetch_tv_guides(client, target_date_strs, state, wanted_channels, channel_index)
+                print(f"\n📊 EPG client stats: {client.stats()}")
+                return results
+        except CredentialsRejectedError as e:
+            clear_cached_credentials()
+            if not from_cache:
+                print(f"❌ Freshly harvested credentials were rejected ({e}).")
+                return None
+            print(f"🔑 Cached credentials were rejected ({e}). Refreshing with the browser...")
+            token, cookies, from_cache = get_credentials(force_refresh=True)
+
+    print("\nCould not retrieve credentials. Aborting scraper.")
+    return None
+
+def print_guide(schedule, target_date, day_label):
+    if not schedule or not schedule.channel_names:
         print(f"No channel data was fetched for {day_label}.")
         return
 
@@ -144,119 +1070,686 @@ def print_guide(all_channels, day_label):
     print(f"📺 TV GUIDE SCHEDULE FOR {day_label.upper()} (Filtered for your channels)")
     print("=" * 60)
     
-    channels_printed = 0
-    for channel in all_channels:
-        channel_name = channel.get('channelname', 'Unknown Channel')
+    for channel, channel_name in enumerate(schedule.channel_names):
+        print(f"\n- {channel_name or 'Unknown Channel'}")
         
-        channels_printed += 1
-        print(f"\n- {channel_name}")
-        
-        if 'programs' in channel and channel['programs']:
-            for program in channel['programs']:
-                program_name = program.get('title', 'Unknown Program')
-                start_time_str = program.get('start', '')
-                end_time_str = program.get('stop', '')
-                start_time = start_time_str[11:16] if start_time_str else ''
-                end_time = end_time_str[11:16] if end_time_str else ''
-                time_display = f"{start_time} - {end_time}" if start_time and end_time else "Live"
-                print(f"  ⏰ {time_display}: {program_name}")
+        day_programs = schedule.day_programs(channel, target_date)
+        if day_programs:
+            for _, _, program in day_programs:
+                print(f"  ⏰ {format_hhmm(program.start)} - {format_hhmm(program.stop)}: {program.title or 'Unknown Program'}")
         else:
             print("  No program information available.")
-    
-    if channels_printed == 0:
-        print("\nNone of your desired channels were found in the schedule for this day.")
 
 # ==============================================================================
-# --- PART 2: HTML GUIDE GENERATOR CODE (from generate_html_guide.py) ---
+# --- SCHEDULE MODEL ---
 # ==============================================================================
 
-def create_timeline_guide():
-    desired_channels = [
-        "&prive HD", "&flix HD", "MNX", "Sony Pix", "Movies Now",
-        "Star Movies", "Romedy Now", "MN+", "Star Movies Select HD"
-    ]
-    JSON_INPUT_FILE = 'tv_guide_today_and_tomorrow.json'
-    HTML_OUTPUT_FILE = 'index.html' # <<< YOUR FIX IS INCLUDED HERE
+EPOCH = datetime(1970, 1, 1)
+MINUTES_PER_DAY = 1440
 
-    def parse_assumed_local_time(time_str):
-        return datetime.fromisoformat(time_str[:-1])
 
-    print("\n" + "=" * 60)
-    print("--- Starting HTML Guide Generation (v6.1 Timestamp Fix) ---")
+def parse_epoch_minutes(time_str):
+    """
+    Converts an EPG timestamp such as '2025-10-17T06:00:00Z' to minutes since
+    the epoch. The trailing 'Z' is dropped: the times are IST wall-clock times.
+    """
+    return int((datetime.fromisoformat(time_str[:-1]) - EPOCH).total_seconds()) // 60
+
+
+def format_epoch_minutes(minutes):
+    return (EPOCH + timedelta(minutes=minutes)).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def format_hhmm(minutes):
+    minute_of_day = minutes % MINUTES_PER_DAY
+    return f"{minute_of_day // 60:02d}:{minute_of_day % 60:02d}"
+
+
+def day_start_minutes(day):
+    return (day - EPOCH.date()).days * MINUTES_PER_DAY
 
+
+def minutes_to_date(minutes):
+    return EPOCH.date() + timedelta(days=minutes // MINUTES_PER_DAY)
+
+
+def _start_key(prog):
+    return prog.get('start') or ''
+
+
+def _drop_repeats(programs):
+    """Drops repeated (start, stop, title) programs from a start-sorted list; only equal starts are compared."""
+    kept = []
+    last_start = None
+    run = 0
+    for prog in programs:
+        start = prog.get('start') or ''
+        if start != last_start:
+            last_start = start
+            run = len(kept)
+        elif any(prog.get('stop') == k.get('stop') and prog.get('title') == k.get('title') for k in kept[run:]):
+            continue
+        kept.append(prog)
+    return kept
+
+
+def _reconcile(programs):
+    """
+    `programs` (day lists laid end to end) as one list sorted by start without
+    repeats. Finding where the starts stop increasing runs in C; usually that
+    is only at a day boundary, where the program running over midnight is
+    listed again, and that copy is sliced out. Anything else (a day out of
+    order, a day overlapping the next) is sorted and de-duplicated in full.
+    """
     try:
-        with open(JSON_INPUT_FILE, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        all_channels_data = data.get('programDetailsByChannel', [])
-    except Exception as e:
-        print(f"❌ Error loading or parsing JSON file: {e}")
-        return
+        starts = list(map(itemgetter('start'), programs))
+        breaks = list(compress(count(1), map(ge, starts, starts[1:])))
+    except (KeyError, TypeError):
+        return _drop_repeats(sorted(programs, key=_start_key))
+    if not breaks:
+        return list(programs)
+    for i in breaks:
+        before, repeat = programs[i - 1], programs[i]
+        if not (starts[i] == starts[i - 1] and (i + 1 == len(starts) or starts[i + 1] > starts[i])
+                and repeat.get('stop') == before.get('stop') and repeat.get('title') == before.get('title')):
+            return _drop_repeats(sorted(programs, key=_start_key))
+    kept = []
+    previous = 0
+    for i in breaks:
+        kept += programs[previous:i]
+        previous = i + 1
+    kept += programs[previous:]
+    return kept
 
-    filtered_channels = [ch for ch in all_channels_data if not desired_channels or ch.get('channelname') in desired_channels]
-    if not filtered_channels:
-        print("❌ Warning: None of your desired channels were found in the JSON file.")
-        return
-    print(f"✅ Found {len(filtered_channels)} matching channels to display.")
 
-    ist_timezone = timezone(timedelta(hours=5, minutes=30))
-    today_date = datetime.now(ist_timezone).date()
-    tomorrow_date = today_date + timedelta(days=1)
+def merge_days(channel_lists):
+    """
+    Merges the endpoint's per-day channel lists into one list without touching
+    them. Channels keep the order they are first seen in, so a channel that is
+    only listed on a later day is kept too. Each day list arrives sorted by
+    start (fixed-width timestamps, so they compare as text), so a channel's
+    days are laid end to end and only reconciled where they meet: the copy of
+    a program listed on both days (same start, stop and title, e.g. one
+    running over midnight) is dropped there.
+    """
+    firsts = {}
+    day_lists = {}
+    for channels in channel_lists:
+        for ch in channels:
+            name = ch.get('channelname')
+            if name in day_lists:
+                day_lists[name].append(ch.get('programs') or [])
+            else:
+                firsts[name] = ch
+                day_lists[name] = [ch.get('programs') or []]
 
-    color_palette = [
-        ("#4285F4", "#1a73e8"), ("#DB4437", "#c53727"), ("#0F9D58", "#0b8043"),
-        ("#AB47BC", "#8E24AA"), ("#00ACC1", "#00838F"), ("#FF7043", "#F4511E"),
-        ("#F4B400", "#f09300"), ("#78909C", "#546E7A"), ("#5C6BC0", "#3949AB")
-    ]
+    return [{**firsts[name], 'programs': _reconcile(lists[0] if len(lists) == 1 else list(chain.from_iterable(lists)))}
+            for name, lists in day_lists.items()]
 
-    def generate_program_blocks(channels, target_date):
-        blocks = []
-        for i, ch in enumerate(channels):
-            bg_color, border_color = color_palette[i % len(color_palette)]
-            for prog in ch.get('programs', []):
-                p_start = parse_assumed_local_time(prog['start'])
-                p_stop = parse_assumed_local_time(prog['stop'])
-                if p_start.date() == target_date:
-                    duration_minutes = (p_stop - p_start).total_seconds() / 60
-                    if duration_minutes <= 0: continue
-                    start_minute_of_day = p_start.hour * 60 + p_start.minute
-                    top_percent = (start_minute_of_day / 1440) * 100
-                    height_percent = (duration_minutes / 1440) * 100
-                    left_pixels = i * 200
-                    width_pixels = 190
-                    style = (
-                        f'top:{top_percent:.4f}%; left:{left_pixels}px; height:{height_percent:.4f}%; width:{width_pixels}px;'
-                        f'background-color: {bg_color}; border-color: {border_color};'
-                    )
-                    description = html.escape(prog.get("desc", "No description available."))
-                    title = html.escape(prog.get("title", "Untitled Program"))
-                    time_str = f'{p_start.strftime("%H:%M")} - {p_stop.strftime("%H:%M")}'
-                    blocks.append(
-                        f'<div class="program-block" style="{style}" data-description="{description}">'
-                        f'<span class="program-title">{title}</span>'
-                        f'<span class="program-time">{time_str}</span>'
-                        '</div>'
+
+class Program:
+    """One program, with its times parsed once at ingest (epoch minutes)."""
+    __slots__ = ('start', 'stop', 'channel', 'title', 'desc')
+
+    def __init__(self, start, stop, channel, title, desc):
+        self.start = start
+        self.stop = stop
+        self.channel = channel
+        self.title = title
+        self.desc = desc
+
+
+class Schedule:
+    """
+    Normalized schedule shared by the console printer, the JSON writer and the
+    HTML renderer. Channels are numbered in the order they are first seen;
+    each channel's programs are kept sorted by start next to a parallel list
+    of starts, so a day's programs are found with two bisects instead of a scan.
+    Titles and descriptions are interned, so repeats share one string.
+    Times are wall-clock times in `tz` (IST, as scraped, unless the schedule
+    was converted for a profile).
+    """
+    def __init__(self, tz=IST_TIMEZONE):
+        self.tz = tz
+        self.channel_names = []
+        self._channel_ids = {}
+        self._programs = []
+        self._starts = []
+        self._sorted = True
+        self._days = None
+
+    @classmethod
+    def from_channels(cls, channels):
+        """Builds a schedule from channel dicts as returned by the EPG endpoint."""
+        schedule = cls()
+        for ch in channels:
+            channel = schedule.channel_id(ch.get('channelname'))
+            for prog in ch.get('programs') or []:
+                try:
+                    start = parse_epoch_minutes(prog['start'])
+                    stop = parse_epoch_minutes(prog['stop'])
+                except (KeyError, TypeError, ValueError):
+                    continue
+                schedule.add_program(channel, start, stop, prog.get('title'), prog.get('desc'))
+        return schedule
+
+    def channel_id(self, name):
+        channel = self._channel_ids.get(name)
+        if channel is None:
+            channel = self._channel_ids[name] = len(self.channel_names)
+            self.channel_names.append(name)
+            self._programs.append([])
+            self._starts.append([])
+        return channel
+
+    def add_program(self, channel, start, stop, title=None, desc=None):
+        programs = self._programs[channel]
+        if programs and start < programs[-1].start:
+            self._sorted = False
+        programs.append(Program(start, stop, channel,
+                                sys.intern(title) if title is not None else None,
+                                sys.intern(desc) if desc is not None else None))
+        self._starts[channel].append(start)
+        self._days = None
+
+    def _ensure_sorted(self):
+        if self._sorted:
+            return
+        for channel, programs in enumerate(self._programs):
+            programs.sort(key=lambda p: p.start)
+            self._starts[channel] = [p.start for p in programs]
+        self._sorted = True
+
+    def programs(self, channel):
+        self._ensure_sorted()
+        return self._programs[channel]
+
+    def programs_between(self, channel, start, stop):
+        """Programs of `channel` that start in [start, stop), in epoch minutes."""
+        self._ensure_sorted()
+        starts = self._starts[channel]
+        return self._programs[channel][bisect_left(starts, start):bisect_left(starts, stop)]
+
+    def programs_on_day(self, channel, day):
+        day_start = day_start_minutes(day)
+        return self.programs_between(channel, day_start, day_start + MINUTES_PER_DAY)
+
+    def day_programs(self, channel, day):
+        """
+        What `channel` shows on `day`, as (start, stop, program) with start and
+        stop clipped to the day, so a program running over midnight appears on
+        both days. All days are partitioned in one pass, the first time any day
+        is asked for, so rendering a day only touches that day's programs.
+        """
+        if self._days is None:
+            self._partition_days()
+        return self._days.get((day - EPOCH.date()).days, {}).get(channel, ())
+
+    def _partition_days(self):
+        self._ensure_sorted()
+        days = {}
+        for channel, programs in enumerate(self._programs):
+            current_day, pieces = None, None
+            for p in programs:
+                first_day = p.start // MINUTES_PER_DAY
+                last_day = (p.stop - 1) // MINUTES_PER_DAY
+                if first_day != current_day:
+                    current_day = first_day
+                    pieces = days.setdefault(first_day, {}).setdefault(channel, [])
+                if last_day <= first_day:
+                    pieces.append((p.start, p.stop, p))
+                    continue
+                for day in range(first_day, last_day + 1):
+                    day_start = day * MINUTES_PER_DAY
+                    days.setdefault(day, {}).setdefault(channel, []).append(
+                        (max(p.start, day_start), min(p.stop, day_start + MINUTES_PER_DAY), p))
+        self._days = days
+
+    def days(self):
+        return sorted({minutes_to_date(start) for starts in self._starts for start in starts})
+
+    def __len__(self):
+        return sum(len(programs) for programs in self._programs)
+
+    def to_channels(self):
+        """The schedule in the endpoint's shape, for the JSON writer."""
+        channels = []
+        for channel, name in enumerate(self.channel_names):
+            programs = []
+            for p in self.programs(channel):
+                prog = {'start': format_epoch_minutes(p.start), 'stop': format_epoch_minutes(p.stop)}
+                if p.title is not None:
+                    prog['title'] = p.title
+                if p.desc is not None:
+                    prog['desc'] = p.desc
+                programs.append(prog)
+            channels.append({'channelname': name, 'programs': programs})
+        return channels
+
+
+def save_schedule_json(schedule, out):
+    """Streams the schedule as the endpoint-shaped JSON document into the text stream `out`."""
+    json.dump({"programDetailsByChannel": schedule.to_channels()}, out, indent=2, ensure_ascii=False)
+
+# ==============================================================================
+# --- SCHEDULE ARCHIVE ---
+# ==============================================================================
+
+class ScheduleArchive:
+    """
+    On-disk SQLite archive of every program seen, so the guide keeps history
+    across runs instead of only knowing the dates fetched this time.
+
+    Programs are keyed by (channel_id, start) in a WITHOUT ROWID table, so the
+    primary key is the index: upserts touch one B-tree, and a channel's programs
+    for any time range are a single range scan however much history builds up.
+    A second index on start serves time-range queries across all channels.
+    """
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS channels (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE
+        );
+        CREATE TABLE IF NOT EXISTS programs (
+            channel_id INTEGER NOT NULL REFERENCES channels(id),
+            start INTEGER NOT NULL,
+            stop INTEGER NOT NULL,
+            title TEXT,
+            description TEXT,
+            PRIMARY KEY (channel_id, start)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS programs_by_start ON programs(start);
+    """
+    UPSERT = """
+        INSERT INTO programs (channel_id, start, stop, title, description) VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (channel_id, start) DO UPDATE SET
+            stop = excluded.stop, title = excluded.title, description = excluded.description
+        WHERE stop IS NOT excluded.stop OR title IS NOT excluded.title OR description IS NOT excluded.description
+    """
+
+    def __init__(self, path=ARCHIVE_FILE):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(self.SCHEMA)
+        self._channel_ids = dict(self.conn.execute("SELECT name, id FROM channels"))
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _channel_db_id(self, name, create=False):
+        channel_db_id = self._channel_ids.get(name)
+        if channel_db_id is None and create:
+            channel_db_id = self.conn.execute("INSERT INTO channels (name) VALUES (?)", (name,)).lastrowid
+            self._channel_ids[name] = channel_db_id
+        return channel_db_id
+
+    def store(self, schedule, days):
+        """
+        Upserts the programs of `schedule` that start on one of `days`, the
+        days that were actually fetched. On each of those days a channel's
+        archived programs are replaced by the fetched ones, so rescheduled
+        programs do not linger next to their new slot; a day that failed to
+        fetch, or a channel with nothing fetched for a day, keeps what the
+        archive already has.
+        Returns the number of rows inserted, updated or removed.
+        """
+        day_starts = sorted(day_start_minutes(day) for day in days)
+        changes_before = self.conn.total_changes
+        with self.conn:
+            for channel, name in enumerate(schedule.channel_names):
+                for day_start in day_starts:
+                    day_stop = day_start + MINUTES_PER_DAY
+                    programs = schedule.programs_between(channel, day_start, day_stop)
+                    if not programs:
+                        continue
+                    channel_db_id = self._channel_db_id(name, create=True)
+                    self.conn.executemany(self.UPSERT, [
+                        (channel_db_id, p.start, p.stop, p.title, p.desc) for p in programs
+                    ])
+                    starts = [p.start for p in programs]
+                    self.conn.execute(
+                        f"DELETE FROM programs WHERE channel_id = ? AND start >= ? AND start < ? "
+                        f"AND start NOT IN ({','.join('?' * len(starts))})",
+                        (channel_db_id, day_start, day_stop, *starts),
                     )
-        return ''.join(blocks)
+        return self.conn.total_changes - changes_before
 
-    num_channels = len(filtered_channels)
-    grid_width = num_channels * 200
-    channel_headers_html = ''.join([f'<div class="channel-header">{html.escape(ch["channelname"])}</div>' for ch in filtered_channels])
-    today_blocks = generate_program_blocks(filtered_channels, today_date)
-    tomorrow_blocks = generate_program_blocks(filtered_channels, tomorrow_date)
-    time_markers_html = ''.join([f'<div class="time-marker"><span>{h % 24:02d}:00</span></div>' for h in range(24)])
+    def programs_on_day(self, channel_name, day):
+        """One channel's programs for one day, straight off the primary key."""
+        channel_db_id = self._channel_db_id(channel_name)
+        if channel_db_id is None:
+            return []
+        day_start = day_start_minutes(day)
+        return self.conn.execute(
+            "SELECT start, stop, title, description FROM programs "
+            "WHERE channel_id = ? AND start >= ? AND start < ? ORDER BY start",
+            (channel_db_id, day_start, day_start + MINUTES_PER_DAY),
+        ).fetchall()
 
-    JAVASCRIPT_BLOCK = """
-    <script>
-        document.addEventListener('DOMContentLoaded', function() {
-            const scrollPane = document.querySelector('.schedule-scroll-pane');
-            const timeMarkers = document.querySelector('.time-markers');
+    def load_schedule(self, start_day, end_day, channel_names=None):
+        """
+        Builds a Schedule of the programs airing in [start_day, end_day), including
+        one that started the evening before, with channels in the order of
+        `channel_names` (all archived channels if None). Channels that were
+        never archived are left out.
+        """
+        if channel_names is None:
+            channel_names = [name for name, in self.conn.execute("SELECT name FROM channels ORDER BY id")]
+        window_start, window_stop = day_start_minutes(start_day), day_start_minutes(end_day)
+        schedule = Schedule()
+        for name in channel_names:
+            channel_db_id = self._channel_db_id(name)
+            if channel_db_id is None:
+                continue
+            channel = schedule.channel_id(name)
+            for start, stop, title, desc in self.conn.execute(
+                "SELECT start, stop, title, description FROM programs "
+                "WHERE channel_id = ? AND start >= ? AND start < ? AND stop > ? ORDER BY start",
+                (channel_db_id, window_start - MINUTES_PER_DAY, window_stop, window_start),
+            ):
+                schedule.add_program(channel, start, stop, title, desc)
+        return schedule
+
+    def compact(self, retention_days=ARCHIVE_RETENTION_DAYS):
+        """
+        Drops programs that ended more than `retention_days` ago and channels
+        left without programs, then VACUUMs once enough of the file is free
+        pages, so the database size stays bounded. Returns the rows removed.
+        """
+        cutoff = day_start_minutes(datetime.now(IST_TIMEZONE).date() - timedelta(days=retention_days))
+        with self.conn:
+            removed = self.conn.execute("DELETE FROM programs WHERE stop < ?", (cutoff,)).rowcount
+            self.conn.execute("DELETE FROM channels WHERE id NOT IN (SELECT DISTINCT channel_id FROM programs)")
+        self._channel_ids = dict(self.conn.execute("SELECT name, id FROM channels"))
+
+        free_pages, = self.conn.execute("PRAGMA freelist_count").fetchone()
+        total_pages, = self.conn.execute("PRAGMA page_count").fetchone()
+        if total_pages and free_pages / total_pages >= ARCHIVE_VACUUM_FREE_RATIO:
+            self.conn.execute("VACUUM")
+        return removed
+
+# ==============================================================================
+# --- SCHEDULE QUERIES ---
+# ==============================================================================
+
+def to_epoch_minutes(when):
+    """
+    Epoch minutes for a query time: an int is taken as epoch minutes already, an
+    aware datetime is converted to IST, and a naive one is read as IST wall clock.
+    """
+    if isinstance(when, int):
+        return when
+    if when.tzinfo is not None:
+        when = when.astimezone(IST_TIMEZONE).replace(tzinfo=None)
+    return int((when - EPOCH).total_seconds()) // 60
+
+
+class ScheduleIndex:
+    """
+    Read-only query API over a Schedule: what is on a channel at a time,
+    now/next across channels, everything airing in a time range, and title
+    search, without scanning every program.
+
+    Each channel keeps its programs sorted by start (the Schedule's own
+    order) next to a running maximum of their stops. A program overlapping
+    [start, stop) can only sit between the first index whose running max
+    stop passes `start` and the first index whose start reaches `stop`, so
+    every query is two bisects plus the matches, even if programs overlap.
+    The same arrays are kept for all channels together (ordered by start,
+    then channel), so "everything airing in the next 30 minutes" does not
+    have to visit every channel. Titles are indexed by lower-cased word,
+    with the words kept sorted so a query word matches by prefix.
+    """
+    def __init__(self, schedule):
+        self.schedule = schedule
+        self._starts = []
+        self._max_stops = []
+        for channel in range(len(schedule.channel_names)):
+            programs = schedule.programs(channel)
+            self._starts.append([p.start for p in programs])
+            max_stops, running = [], None
+            for p in programs:
+                running = p.stop if running is None else max(running, p.stop)
+                max_stops.append(running)
+            self._max_stops.append(max_stops)
+        self._all = sorted((p for channel in range(len(schedule.channel_names)) for p in schedule.programs(channel)),
+                           key=lambda p: (p.start, p.channel))
+        self._all_starts = [p.start for p in self._all]
+        self._all_max_stops = []
+        running = None
+        for p in self._all:
+            running = p.stop if running is None else max(running, p.stop)
+            self._all_max_stops.append(running)
+        self._channel_ids = {name: channel for channel, name in enumerate(schedule.channel_names)}
+        self._title_index = None
+
+    def _channels(self, channel_names):
+        if channel_names is None:
+            return range(len(self.schedule.channel_names))
+        return [self._channel_ids[name] for name in channel_names if name in self._channel_ids]
+
+    def _overlapping(self, channel, start, stop):
+        programs = self.schedule.programs(channel)
+        first = bisect_right(self._max_stops[channel], start)
+        last = bisect_left(self._starts[channel], stop)
+        return [p for p in programs[first:last] if p.stop > start]
+
+    def on_at(self, channel_name, when):
+        """The program on `channel_name` at `when` (the latest-starting one if several overlap), or None."""
+        channel = self._channel_ids.get(channel_name)
+        if channel is None:
+            return None
+        minute = to_epoch_minutes(when)
+        airing = self._overlapping(channel, minute, minute + 1)
+        return airing[-1] if airing else None
+
+    def next_after(self, channel_name, when):
+        """The first program on `channel_name` starting after `when`, or None."""
+        channel = self._channel_ids.get(channel_name)
+        if channel is None:
+            return None
+        i = bisect_right(self._starts[channel], to_epoch_minutes(when))
+        programs = self.schedule.programs(channel)
+        return programs[i] if i < len(programs) else None
+
+    def now_next(self, when, channel_names=None):
+        """[(channel name, program on now or None, next program or None)] for every (or each given) channel."""
+        minute = to_epoch_minutes(when)
+        names = self.schedule.channel_names
+        return [(names[channel], self.on_at(names[channel], minute), self.next_after(names[channel], minute))
+                for channel in self._channels(channel_names)]
+
+    def airing_between(self, start, stop, channel_names=None):
+        """[(channel name, program)] for every program overlapping [start, stop), ordered by start."""
+        start, stop = to_epoch_minutes(start), to_epoch_minutes(stop)
+        names = self.schedule.channel_names
+        if channel_names is None:
+            first = bisect_right(self._all_max_stops, start)
+            last = bisect_left(self._all_starts, stop)
+            return [(names[p.channel], p) for p in self._all[first:last] if p.stop > start]
+        hits = [(names[channel], p) for channel in self._channels(channel_names)
+                for p in self._overlapping(channel, start, stop)]
+        hits.sort(key=lambda hit: (hit[1].start, hit[1].channel))
+        return hits
+
+    def _build_title_index(self):
+        programs_by_title = {}
+        for channel in range(len(self.schedule.channel_names)):
+            for p in self.schedule.programs(channel):
+                if p.title:
+                    programs_by_title.setdefault(p.title, []).append(p)
+        words_by_title = {title: tuple(set(re.findall(r'\w+', title.lower()))) for title in programs_by_title}
+        titles_by_word = {}
+        for title, title_words in words_by_title.items():
+            for word in title_words:
+                titles_by_word.setdefault(word, []).append(title)
+        self._title_index = (sorted(titles_by_word), titles_by_word, words_by_title, programs_by_title)
+
+    def search_titles(self, text, start=None, stop=None, limit=None, channel_names=None):
+        """
+        [(channel name, program)] whose title has a word starting with each
+        word of `text` (case-insensitive), optionally only those overlapping
+        [start, stop) and on `channel_names`, ordered by start; the first
+        `limit` of them.
+        """
+        if self._title_index is None:
+            self._build_title_index()
+        words, titles_by_word, words_by_title, programs_by_title = self._title_index
+        query_words = re.findall(r'\w+', text.lower())
+        if not query_words:
+            return []
+
+        def matching_words(query_word):
+            i = bisect_left(words, query_word)
+            j = i
+            while j < len(words) and words[j].startswith(query_word):
+                j += 1
+            return words[i:j]
+
+        # Only the titles of the rarest query word are collected; the other words are checked on those.
+        rarest = min((matching_words(query_word) for query_word in query_words),
+                     key=lambda found: sum(len(titles_by_word[word]) for word in found))
+        candidates = {title for word in rarest for title in titles_by_word[word]}
+        matches = [p for title in candidates
+                   if all(any(word.startswith(query_word) for word in words_by_title[title])
+                          for query_word in query_words)
+                   for p in programs_by_title[title]]
+        lo = to_epoch_minutes(start) if start is not None else None
+        hi = to_epoch_minutes(stop) if stop is not None else None
+        channels = set(self._channels(channel_names)) if channel_names is not None else None
+        hits = sorted((p for p in matches if (lo is None or p.stop > lo) and (hi is None or p.start < hi)
+                       and (channels is None or p.channel in channels)),
+                      key=lambda p: (p.start, p.channel))
+        names = self.schedule.channel_names
+        return [(names[p.channel], p) for p in hits[:limit]]
+
+
+def load_query_schedule(num_days=GUIDE_DAYS):
+    """
+    The schedule the query CLI works on: yesterday (for programs running past
+    midnight) through the rolling window, from the archive if there is one,
+    otherwise from the saved JSON.
+    """
+    today_date = datetime.now(IST_TIMEZONE).date()
+    if os.path.exists(ARCHIVE_FILE):
+        with ScheduleArchive() as archive:
+            return archive.load_schedule(today_date - timedelta(days=1), today_date + timedelta(days=num_days))
+    with open(os.path.join(SITE_DIR, JSON_OUTPUT_FILE), 'r', encoding='utf-8') as f:
+        return Schedule.from_channels(json.load(f).get('programDetailsByChannel', []))
+
+
+def _format_program(p):
+    if p is None:
+        return "—"
+    return f"{format_hhmm(p.start)} - {format_hhmm(p.stop)}: {p.title or 'Untitled Program'}"
+
+
+def run_query(args):
+    """The `query` subcommand: prints the answer to one now/next/range/search question."""
+    try:
+        schedule = load_query_schedule()
+    except FileNotFoundError:
+        print("❌ No saved schedule yet (no archive and no saved JSON): run `python final.py` to scrape one first.")
+        sys.exit(1)
+    index = ScheduleIndex(schedule)
+    when = datetime.fromisoformat(args.at) if getattr(args, 'at', None) else datetime.now(IST_TIMEZONE)
+    channels = args.channel or None
+    unknown = [name for name in channels or [] if name not in index.schedule.channel_names]
+    if unknown:
+        print(f"⚠️ Not in the saved schedule: {', '.join(unknown)}")
+
+    if args.query == 'now':
+        print(f"📺 On now ({format_hhmm(to_epoch_minutes(when))} IST)")
+        for name, current, upcoming in index.now_next(when, channels):
+            print(f"- {name}\n  ▶️ {_format_program(current)}\n  ⏭️ {_format_program(upcoming)}")
+    elif args.query == 'next':
+        start = to_epoch_minutes(when)
+        print(f"📺 Airing in the next {args.minutes} minutes")
+        for name, p in index.airing_between(start, start + args.minutes, channels):
+            print(f"  ⏰ {_format_program(p)} ({name})")
+    elif args.query == 'range':
+        print(f"📺 Airing between {args.start} and {args.stop}")
+        for name, p in index.airing_between(datetime.fromisoformat(args.start), datetime.fromisoformat(args.stop),
+                                            channels):
+            print(f"  ⏰ {minutes_to_date(p.start)} {_format_program(p)} ({name})")
+    elif args.query == 'search':
+        hits = index.search_titles(args.text, start=when, limit=args.limit, channel_names=channels)
+        print(f"🔎 {len(hits)} upcoming airing(s) matching '{args.text}'")
+        for name, p in hits:
+            print(f"  ⏰ {minutes_to_date(p.start)} {_format_program(p)} ({name})")
+
+# ==============================================================================
+# --- PART 2: HTML GUIDE GENERATOR CODE (from generate_html_guide.py) ---
+# ==============================================================================
+
+COLOR_PALETTE = [
+    ("#4285F4", "#1a73e8"), ("#DB4437", "#c53727"), ("#0F9D58", "#0b8043"),
+    ("#AB47BC", "#8E24AA"), ("#00ACC1", "#00838F"), ("#FF7043", "#F4511E"),
+    ("#F4B400", "#f09300"), ("#78909C", "#546E7A"), ("#5C6BC0", "#3949AB")
+]
+
+# --- OUTPUT CONFIGURATION ---
+OUTPUT_MODE = 'inline'          # 'inline': one self-contained index.html
+                                # 'virtual': a small shell page + per-day, per-channel-chunk JSON data files,
+                                #            rendered in view only (use this for hundreds of channels)
+VIRTUAL_DATA_DIR = 'guide-data'
+VIRTUAL_CHUNK_CHANNELS = 50     # Channels per data file in 'virtual' mode
+SITE_DIR = 'site'               # Everything that gets deployed is written here (and only here)
+SITE_ASSETS_DIR = 'assets'      # Content-hashed CSS/JS, relative to SITE_DIR
+PRECOMPRESS_MIN_SIZE = 256      # Files smaller than this get no .gz/.br siblings
+STREAM_BUFFER_SIZE = 64 * 1024  # Characters buffered before a streamed page is written out
+EXPORT_FORMATS = ['xmltv', 'ndjson', 'csv']  # Extra machine-readable artifacts published next to the JSON (see EXPORTERS)
+
+
+GUIDE_MARKUP_VERSION = 2  # Part of the grid and output cache keys: bump it when the generated markup changes
+
+GUIDE_CSS = """
+        :root { --header-height: 60px; --timeline-header-height: 40px; --time-col-width: 60px; --channel-width: 200px; --hour-height: 80px; }
+        html, body { height: 100%; margin: 0; overflow: hidden; font-family: 'Roboto', sans-serif; background-color: #f1f3f4; }
+        .page-header { height: var(--header-height); text-align: center; background-color: #fff; border-bottom: 1px solid #ddd; display: flex; align-items: center; justify-content: center; flex-direction: column; padding: 5px 0; box-sizing: border-box; }
+        .page-header h1 { margin: 0 0 5px 0; font-size: 1.2em; }
+        .date-switcher button { font-size: 0.9em; padding: 5px 12px; margin: 0 5px; border: 1px solid #ccc; background-color: #fff; border-radius: 5px; cursor: pointer; }
+        .date-switcher button.active { background-color: #1a73e8; color: white; border-color: #1a73e8; }
+        .timeline-container { display: grid; grid-template-columns: var(--time-col-width) 1fr; grid-template-rows: var(--timeline-header-height) 1fr; height: calc(100vh - var(--header-height)); }
+        .corner-block { grid-column: 1; grid-row: 1; background-color: #fff; border-right: 1px solid #ddd; border-bottom: 1px solid #ddd; }
+        .channels-header-wrapper { grid-column: 2; grid-row: 1; background-color: #fff; overflow: hidden; border-bottom: 1px solid #ddd; }
+        .channels-header-content { display: flex; }
+        .channel-header { flex: 0 0 var(--channel-width); box-sizing: border-box; text-align: center; padding: 10px 5px; font-weight: 500; border-left: 1px solid #ddd; white-space: nowrap; overflow: hidden; text-overflow: ellipsis; }
+        .time-markers { grid-column: 1; grid-row: 2; overflow-y: hidden; text-align: right; font-size: 0.8em; color: #5f6368; background-color: #fff; border-right: 1px solid #ddd; }
+        .time-marker { height: var(--hour-height); box-sizing: border-box; padding-right: 5px; position: relative; }
+        .time-marker span { position: relative; top: -0.6em; }
+        .schedule-scroll-pane { grid-column: 2; grid-row: 2; overflow: auto; }
+        .schedule-grid { position: relative; height: calc(var(--hour-height) * 24);
+                         background-image: linear-gradient(#e0e0e0 1px, transparent 1px), linear-gradient(to right, #e0e0e0 1px, transparent 1px);
+                         background-size: 100% var(--hour-height), var(--channel-width) 100%; }
+        .program-block { position: absolute; width: 190px; box-sizing: border-box; border: 1px solid; color: #fff; border-radius: 4px; padding: 4px; font-size: 0.8em; overflow: hidden; display: flex; flex-direction: column; transition: filter 0.15s ease-in-out; cursor: pointer; }
+        .program-block:hover { z-index: 10; filter: brightness(115%); }
+        .program-title { font-weight: 500; white-space: nowrap; overflow: hidden; text-overflow: ellipsis; }
+        .program-time { font-size: 0.9em; opacity: 0.8; white-space: nowrap; }
+        .time-indicator { position: absolute; width: 100%; height: 2px; background-color: #ea4335; left: 0; z-index: 20; display: none; pointer-events: none; }
+        .time-indicator::before { content: ''; display: block; width: 10px; height: 10px; border-radius: 50%; background-color: #ea4335; position: absolute; left: -5px; top: -4px; }
+        #tooltip { position: fixed; display: none; background: rgba(0,0,0,0.85); color: white; padding: 10px 15px; border-radius: 6px; z-index: 100; max-width: 300px; font-size: 0.9em; pointer-events: none; }
+        .hidden { display: none; }
+"""
+
+GUIDE_JAVASCRIPT = """
+        document.addEventListener('DOMContentLoaded', function() {
+            const scrollPane = document.querySelector('.schedule-scroll-pane');
+            const timeMarkers = document.querySelector('.time-markers');
             const channelsHeader = document.querySelector('.channels-header-wrapper');
-            const todayBtn = document.getElementById('todayBtn');
-            const tomorrowBtn = document.getElementById('tomorrowBtn');
-            const todayGrid = document.getElementById('todayGrid');
-            const tomorrowGrid = document.getElementById('tomorrowGrid');
+            const dayButtons = document.querySelectorAll('.date-switcher button');
+            const dayGrids = document.querySelectorAll('.schedule-grid');
+            const todayGrid = dayGrids[0];
             const tooltip = document.getElementById('tooltip');
-            const timeIndicator = document.querySelector('#todayGrid .time-indicator');
+            const timeIndicator = document.querySelector('#dayGrid0 .time-indicator');
             scrollPane.addEventListener('scroll', () => {
                 channelsHeader.scrollLeft = scrollPane.scrollLeft;
                 timeMarkers.scrollTop = scrollPane.scrollTop;
@@ -270,18 +1763,13 @@ def create_timeline_guide():
                     }
                 });
             }
-            function showDay(day) {
-                const isToday = day === 'today';
-                todayGrid.classList.toggle('hidden', !isToday);
-                tomorrowGrid.classList.toggle('hidden', isToday);
-                todayBtn.classList.toggle('active', isToday);
-                tomorrowBtn.classList.toggle('active', !isToday);
-                const visibleGrid = isToday ? todayGrid : tomorrowGrid;
-                updateReadability(visibleGrid);
-                if (isToday) { updateTimeline(); }
+            function showDay(index) {
+                dayGrids.forEach((grid, i) => grid.classList.toggle('hidden', i !== index));
+                dayButtons.forEach((button, i) => button.classList.toggle('active', i === index));
+                updateReadability(dayGrids[index]);
+                if (index === 0) { updateTimeline(); }
             }
-            todayBtn.addEventListener('click', () => showDay('today'));
-            tomorrowBtn.addEventListener('click', () => showDay('tomorrow'));
+            dayButtons.forEach((button, i) => button.addEventListener('click', () => showDay(i)));
             document.querySelectorAll('.program-block').forEach(block => {
                 block.addEventListener('mousemove', function(e) {
                     tooltip.style.display = 'block';
@@ -299,17 +1787,16 @@ def create_timeline_guide():
                     }
                 });
             });
-            function getISTTime() {
-                const now = new Date();
-                const utc_ms = now.getTime();
-                const ist_offset_ms = 330 * 60 * 1000;
-                const istDate = new Date(utc_ms + ist_offset_ms);
-                return { hour: istDate.getUTCHours(), minute: istDate.getUTCMinutes() };
+            const guideClock = new Intl.DateTimeFormat('en-GB', { timeZone: document.body.dataset.timezone, hour: 'numeric', minute: 'numeric', hourCycle: 'h23' });
+            function getGuideTime() {
+                const parts = guideClock.formatToParts(new Date());
+                const part = type => Number(parts.find(p => p.type === type).value);
+                return { hour: part('hour'), minute: part('minute') };
             }
             function updateTimeline() {
                 if (todayGrid.classList.contains('hidden')) return;
-                const istTime = getISTTime();
-                const totalMinutes = istTime.hour * 60 + istTime.minute;
+                const guideTime = getGuideTime();
+                const totalMinutes = guideTime.hour * 60 + guideTime.minute;
                 const topPercent = (totalMinutes / 1440) * 100;
                 if (timeIndicator) {
                     timeIndicator.style.top = `${topPercent}%`;
@@ -317,20 +1804,19 @@ def create_timeline_guide():
                 }
             }
             function scrollToNow() {
-                const istTime = getISTTime();
-                const totalMinutes = istTime.hour * 60 + istTime.minute;
+                const guideTime = getGuideTime();
+                const totalMinutes = guideTime.hour * 60 + guideTime.minute;
                 const topPercent = (totalMinutes / 1440) * 100;
                 const topPositionInPx = (topPercent / 100) * scrollPane.scrollHeight;
                 scrollPane.scrollTo({ top: Math.max(0, topPositionInPx - scrollPane.clientHeight / 3), behavior: 'smooth' });
             }
-            showDay('today');
+            showDay(0);
             scrollToNow();
             setInterval(updateTimeline, 60000);
         });
-    </script>
-    """
+"""
 
-    HTML_TEMPLATE = """
+GUIDE_PAGE_TEMPLATE = """
 <!DOCTYPE html>
 <html lang="en">
 <head>
@@ -338,132 +1824,1368 @@ def create_timeline_guide():
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>TV Timeline Guide</title>
     <link href="https://fonts.googleapis.com/css2?family=Roboto:wght@400;500&display=swap" rel="stylesheet">
-    <style>
-        :root {{ --header-height: 60px; --timeline-header-height: 40px; --time-col-width: 60px; --channel-width: 200px; --hour-height: 80px; }}
-        html, body {{ height: 100%; margin: 0; overflow: hidden; font-family: 'Roboto', sans-serif; background-color: #f1f3f4; }}
-        .page-header {{ height: var(--header-height); text-align: center; background-color: #fff; border-bottom: 1px solid #ddd; display: flex; align-items: center; justify-content: center; flex-direction: column; padding: 5px 0; box-sizing: border-box; }}
-        .page-header h1 {{ margin: 0 0 5px 0; font-size: 1.2em; }}
-        .date-switcher button {{ font-size: 0.9em; padding: 5px 12px; margin: 0 5px; border: 1px solid #ccc; background-color: #fff; border-radius: 5px; cursor: pointer; }}
-        .date-switcher button.active {{ background-color: #1a73e8; color: white; border-color: #1a73e8; }}
-        .timeline-container {{ display: grid; grid-template-columns: var(--time-col-width) 1fr; grid-template-rows: var(--timeline-header-height) 1fr; height: calc(100vh - var(--header-height)); }}
-        .corner-block {{ grid-column: 1; grid-row: 1; background-color: #fff; border-right: 1px solid #ddd; border-bottom: 1px solid #ddd; }}
-        .channels-header-wrapper {{ grid-column: 2; grid-row: 1; background-color: #fff; overflow: hidden; border-bottom: 1px solid #ddd; }}
-        .channels-header-content {{ display: flex; width: {grid_width}px; }}
-        .channel-header {{ flex: 0 0 var(--channel-width); box-sizing: border-box; text-align: center; padding: 10px 5px; font-weight: 500; border-left: 1px solid #ddd; white-space: nowrap; overflow: hidden; text-overflow: ellipsis; }}
-        .time-markers {{ grid-column: 1; grid-row: 2; overflow-y: hidden; text-align: right; font-size: 0.8em; color: #5f6368; background-color: #fff; border-right: 1px solid #ddd; }}
-        .time-marker {{ height: var(--hour-height); box-sizing: border-box; padding-right: 5px; position: relative; }}
-        .time-marker span {{ position: relative; top: -0.6em; }}
-        .schedule-scroll-pane {{ grid-column: 2; grid-row: 2; overflow: auto; }}
-        .schedule-grid {{ position: relative; width: {grid_width}px; height: calc(var(--hour-height) * 24); 
-                         background-image: linear-gradient(#e0e0e0 1px, transparent 1px), linear-gradient(to right, #e0e0e0 1px, transparent 1px);
-                         background-size: 100% var(--hour-height), var(--channel-width) 100%; }}
-        .program-block {{ position: absolute; box-sizing: border-box; border: 1px solid; color: #fff; border-radius: 4px; padding: 4px; font-size: 0.8em; overflow: hidden; display: flex; flex-direction: column; transition: filter 0.15s ease-in-out; cursor: pointer; }}
-        .program-block:hover {{ z-index: 10; filter: brightness(115%); }}
-        .program-title {{ font-weight: 500; white-space: nowrap; overflow: hidden; text-overflow: ellipsis; }}
-        .program-time {{ font-size: 0.9em; opacity: 0.8; white-space: nowrap; }}
-        .time-indicator {{ position: absolute; width: 100%; height: 2px; background-color: #ea4335; left: 0; z-index: 20; display: none; pointer-events: none; }}
-        .time-indicator::before {{ content: ''; display: block; width: 10px; height: 10px; border-radius: 50%; background-color: #ea4335; position: absolute; left: -5px; top: -4px; }}
-        #tooltip {{ position: fixed; display: none; background: rgba(0,0,0,0.85); color: white; padding: 10px 15px; border-radius: 6px; z-index: 100; max-width: 300px; font-size: 0.9em; pointer-events: none; }}
-        .hidden {{ display: none; }}
-    </style>
+    <link rel="stylesheet" href="{stylesheet_url}">
 </head>
-<body>
+<body data-timezone="{timezone}">
     <header class="page-header">
         <h1>My TV Guide</h1>
-        <div class="date-switcher"><button id="todayBtn" class="active">Today</button><button id="tomorrowBtn">Tomorrow</button></div>
+        <div class="date-switcher">{day_buttons_html}</div>
     </header>
     <div class="timeline-container">
         <div class="corner-block"></div>
         <div class="channels-header-wrapper"><div class="channels-header-content">{channel_headers_html}</div></div>
         <div class="time-markers">{time_markers_html}</div>
         <div class="schedule-scroll-pane">
-            <div id="todayGrid" class="schedule-grid"><div class="time-indicator"></div>{today_blocks}</div>
-            <div id="tomorrowGrid" class="schedule-grid hidden">{tomorrow_blocks}</div>
+            {day_grids_html}
         </div>
     </div>
     <div id="tooltip"></div>
-    {javascript_block}
+    <script src="{script_url}"></script>
 </body>
 </html>
 """
 
-    final_html = HTML_TEMPLATE.format(
-        grid_width=grid_width,
-        channel_headers_html=channel_headers_html,
-        time_markers_html=time_markers_html,
-        today_blocks=today_blocks,
-        tomorrow_blocks=tomorrow_blocks,
-        javascript_block=JAVASCRIPT_BLOCK
+# Every block position is a whole minute of the day, so its percentage is formatted once here.
+_DAY_PERCENT = [f'{(minute / 1440) * 100:.4f}%' for minute in range(MINUTES_PER_DAY + 1)]
+_HHMM = [format_hhmm(minute) for minute in range(MINUTES_PER_DAY)]
+# Titles and descriptions repeat across days and channels (reruns, "No description available.").
+_escape = lru_cache(maxsize=64 * 1024)(html.escape)
+
+
+@lru_cache(maxsize=None)
+def compiled_guide_page():
+    """
+    The static parts of the guide, prepared once per process: the page
+    template split into (literal, field) pairs with its markup already
+    minified, and the minified CSS and JavaScript.
+    """
+    parts = [(minify_html(literal), field) for literal, field, _, _ in string.Formatter().parse(GUIDE_PAGE_TEMPLATE)]
+    return parts, minify_css(GUIDE_CSS), minify_js(GUIDE_JAVASCRIPT)
+
+
+def write_template(out, parts, fields):
+    """Writes compiled template `parts` to `out`; a field is a string or an iterable of strings."""
+    for literal, field in parts:
+        out.write(literal)
+        if field is None:
+            continue
+        value = fields[field]
+        if isinstance(value, str):
+            out.write(value)
+        else:
+            for chunk in value:
+                out.write(chunk)
+
+
+def guide_channel_css(num_channels, color_palette=COLOR_PALETTE):
+    """Grid width and one class per channel column (position and colors), so blocks only carry top/height."""
+    rules = [f'.channels-header-content,.schedule-grid{{width:{num_channels * 200}px}}']
+    for i in range(num_channels):
+        bg_color, border_color = color_palette[i % len(color_palette)]
+        rules.append(f'.c{i}{{left:{i * 200}px;background-color:{bg_color};border-color:{border_color}}}')
+    return ''.join(rules)
+
+
+def iter_program_blocks(schedule, channel_ids, target_date):
+    """Yields the program blocks of one day grid, one channel column at a time."""
+    day_start = day_start_minutes(target_date)
+    percent, hhmm, escape = _DAY_PERCENT, _HHMM, _escape
+    for i, channel in enumerate(channel_ids):
+        opening = f'<div class="program-block c{i}" style="top:'
+        blocks = []
+        for piece_start, piece_stop, prog in schedule.day_programs(channel, target_date):
+            if piece_stop <= piece_start: continue
+            description = escape(prog.desc if prog.desc is not None else "No description available.")
+            title = escape(prog.title if prog.title is not None else "Untitled Program")
+            blocks.append(
+                f'{opening}{percent[piece_start - day_start]};height:{percent[piece_stop - piece_start]}" '
+                f'data-description="{description}">'
+                f'<span class="program-title">{title}</span>'
+                f'<span class="program-time">{hhmm[prog.start % MINUTES_PER_DAY]} - {hhmm[prog.stop % MINUTES_PER_DAY]}</span>'
+                '</div>'
+            )
+        if blocks:
+            yield ''.join(blocks)
+
+
+def generate_program_blocks(schedule, channel_ids, target_date):
+    return ''.join(iter_program_blocks(schedule, channel_ids, target_date))
+
+
+def create_timeline_guide(schedule=None, grid_cache=None, days=None, site_dir=SITE_DIR, color_palette=COLOR_PALETTE):
+    """
+    Renders index.html into `site_dir` with one grid per date in `days` (the
+    GUIDE_DAYS window by default) for every channel of the Schedule handed
+    over by the scraper (or a profile's view of it, see render_profile), or
+    of the saved JSON when called on its own. The page is streamed to disk
+    from the compiled template as its blocks are produced. With a
+    `grid_cache` dict (kept in ScrapeState between runs), each day grid is
+    also written to a file in GRID_CACHE_DIR, and a grid whose channels and
+    programs are unchanged is read back from that file, a buffer at a time,
+    instead of being rendered again.
+    """
+
+    print("\n" + "=" * 60)
+    print("--- Starting HTML Guide Generation (v6.1 Timestamp Fix) ---")
+
+    if schedule is None:
+        try:
+            with open(os.path.join(SITE_DIR, JSON_OUTPUT_FILE), 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            schedule = Schedule.from_channels(data.get('programDetailsByChannel', []))
+        except Exception as e:
+            print(f"❌ Error loading or parsing JSON file: {e}")
+            return
+
+    channel_ids = list(range(len(schedule.channel_names)))
+    if not channel_ids:
+        print("❌ Warning: None of your desired channels were found in the schedule.")
+        return
+    print(f"✅ Found {len(channel_ids)} matching channels to display.")
+
+    if days is None:
+        days = guide_dates(tz=schedule.tz)
+
+    num_channels = len(channel_ids)
+    channel_headers_html = ''.join([f'<div class="channel-header">{html.escape(schedule.channel_names[channel])}</div>' for channel in channel_ids])
+
+    def render_day_grid(target_date):
+        if grid_cache is None:
+            yield from iter_program_blocks(schedule, channel_ids, target_date)
+            return
+        day_key = target_date.isoformat()
+        # Hashed a channel at a time, so the key costs no more memory than one column.
+        digest = hashlib.sha1(str(GUIDE_MARKUP_VERSION).encode('utf-8'))
+        for channel in channel_ids:
+            digest.update(json.dumps([
+                schedule.channel_names[channel],
+                [(start, stop, p.start, p.stop, p.title, p.desc) for start, stop, p in schedule.day_programs(channel, target_date)]
+            ], ensure_ascii=False).encode('utf-8'))
+        grid_key = digest.hexdigest()
+        fragment = os.path.join(GRID_CACHE_DIR, f'{grid_key}.html')
+        cached = grid_cache.get(day_key)
+        if cached and cached['key'] == grid_key and os.path.exists(fragment):
+            print(f"♻️ {day_key} grid unchanged, reusing it.")
+            with open(fragment, 'r', encoding='utf-8') as f:
+                yield from iter(lambda: f.read(STREAM_BUFFER_SIZE), '')
+            return
+        os.makedirs(GRID_CACHE_DIR, exist_ok=True)
+        tmp = f'{fragment}.{os.getpid()}.tmp'  # Profiles render in parallel and may share a grid
+        with open(tmp, 'w', encoding='utf-8') as f:
+            for chunk in iter_program_blocks(schedule, channel_ids, target_date):
+                f.write(chunk)
+                yield chunk
+        os.replace(tmp, fragment)
+        grid_cache[day_key] = {'key': grid_key}
+
+    def day_grids():
+        for i, day in enumerate(days):
+            if i == 0:
+                yield f'<div id="dayGrid{i}" class="schedule-grid"><div class="time-indicator"></div>'
+            else:
+                yield f'<div id="dayGrid{i}" class="schedule-grid hidden">'
+            yield from render_day_grid(day)
+            yield '</div>'
+
+    day_buttons_html = ''.join([
+        f'<button class="active">{day_label(i, day)}</button>' if i == 0 else f'<button>{day_label(i, day)}</button>'
+        for i, day in enumerate(days)
+    ])
+    time_markers_html = ''.join([f'<div class="time-marker"><span>{h % 24:02d}:00</span></div>' for h in range(24)])
+
+    parts, static_css, script = compiled_guide_page()
+    css_url, written = publish_asset((static_css + guide_channel_css(num_channels, color_palette)).encode('utf-8'),
+                                     'css', site_dir)
+    js_url, js_written = publish_asset(script.encode('utf-8'), 'js', site_dir)
+    with SiteFileStream(os.path.join(site_dir, HTML_OUTPUT_FILE)) as out:
+        write_template(out, parts, {
+            'timezone': html.escape(timezone_name(schedule.tz)),
+            'stylesheet_url': css_url,
+            'script_url': js_url,
+            'day_buttons_html': day_buttons_html,
+            'channel_headers_html': channel_headers_html,
+            'time_markers_html': time_markers_html,
+            'day_grids_html': day_grids(),
+        })
+    written += js_written + out.written
+    prune_assets([css_url, js_url], site_dir)
+    if grid_cache is not None:
+        for stale_day in set(grid_cache) - {day.isoformat() for day in days}:
+            del grid_cache[stale_day]
+    shutil.rmtree(os.path.join(site_dir, VIRTUAL_DATA_DIR), ignore_errors=True)  # Left over from 'virtual' mode
+
+    print(f"🎉 Success! Your new timeline guide has been created: '{os.path.join(site_dir, HTML_OUTPUT_FILE)}' ({written} file(s) written)")
+
+# ==============================================================================
+# --- SITE OUTPUT (what the Pages deploy publishes) ---
+# ==============================================================================
+
+class SiteFileStream:
+    """
+    Writes a site file as it is produced: text goes through a small buffer
+    into `path`.tmp while its content hash is computed, and close() only
+    replaces `path` (and recompresses its .gz/.br siblings from it, in chunks)
+    when the hash differs from the file already on disk, so an unchanged build
+    leaves the site untouched without the page ever being held in memory.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.size = 0
+        self._hash = hashlib.sha1()
+        self._buffer = []
+        self._buffered = 0
+        self.written = 0
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._file = open(path + '.tmp', 'wb')
+
+    def write(self, text):
+        self._buffer.append(text)
+        self._buffered += len(text)
+        if self._buffered >= STREAM_BUFFER_SIZE:
+            self.flush()
+
+    def write_bytes(self, data):
+        self.flush()
+        self._write(data)
+
+    def flush(self):
+        if self._buffer:
+            data = ''.join(self._buffer).encode('utf-8')
+            self._buffer.clear()
+            self._buffered = 0
+            self._write(data)
+
+    def _write(self, data):
+        self._hash.update(data)
+        self._file.write(data)
+        self.size += len(data)
+
+    def close(self):
+        """Returns the number of files written."""
+        self.flush()
+        self._file.close()
+        tmp = self.path + '.tmp'
+        unchanged = file_sha1(self.path) == self._hash.digest()
+        if unchanged:
+            os.remove(tmp)
+        else:
+            os.replace(tmp, self.path)
+        written = 0 if unchanged else 1
+
+        siblings = {}
+        if self.size >= PRECOMPRESS_MIN_SIZE:
+            # mtime=0 (and no file name) keeps the gzip bytes identical for identical input.
+            siblings['.gz'] = lambda f: gzip.GzipFile(filename='', mode='wb', fileobj=f, compresslevel=9, mtime=0)
+            if brotli is not None:
+                siblings['.br'] = _BrotliWriter
+        for extension, make_writer in siblings.items():
+            target = self.path + extension
+            if unchanged and os.path.exists(target):
+                continue
+            with open(self.path, 'rb') as source, open(target + '.tmp', 'wb') as f:
+                with make_writer(f) as compressed:
+                    shutil.copyfileobj(source, compressed, STREAM_BUFFER_SIZE)
+            os.replace(target + '.tmp', target)
+            written += 1
+        for stale in {'.gz', '.br'} - set(siblings):
+            if os.path.exists(self.path + stale):
+                os.remove(self.path + stale)
+        return written
+
+    def abort(self):
+        self._file.close()
+        os.remove(self.path + '.tmp')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.abort()
+        else:
+            self.written = self.close()
+
+
+class _BrotliWriter:
+    def __init__(self, f):
+        self._f = f
+        self._compressor = brotli.Compressor(quality=11)
+
+    def write(self, data):
+        self._f.write(self._compressor.process(data))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._f.write(self._compressor.finish())
+
+
+def file_sha1(path):
+    """Digest of the file at `path`, read in chunks, or None if it doesn't exist."""
+    digest = hashlib.sha1()
+    try:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(STREAM_BUFFER_SIZE), b''):
+                digest.update(chunk)
+    except FileNotFoundError:
+        return None
+    return digest.digest()
+
+
+def write_site_file(path, data):
+    """
+    Writes `data` (bytes) to `path` with .gz/.br siblings, but only when its
+    content hash differs from the file already on disk (see SiteFileStream).
+    Returns the number of files written.
+    """
+    stream = SiteFileStream(path)
+    stream.write_bytes(data)
+    return stream.close()
+
+
+def remove_site_file(path):
+    for target in (path, path + '.gz', path + '.br'):
+        if os.path.exists(target):
+            os.remove(target)
+
+
+def minify_css(css):
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.S)
+    css = re.sub(r'\s+', ' ', css)
+    css = re.sub(r'\s*([{};,>])\s*', r'\1', css)
+    css = re.sub(r':\s+', ':', css)
+    return css.replace(';}', '}').strip()
+
+
+def minify_js(js):
+    """Conservative: drops indentation, blank lines and whole-line // comments only."""
+    lines = (line.strip() for line in js.splitlines())
+    return '\n'.join(line for line in lines if line and not line.startswith('//'))
+
+
+def minify_html(markup):
+    markup = re.sub(r'>\s+<', '><', markup)
+    markup = re.sub(r'style="([^"]*)"',
+                    lambda m: 'style="' + re.sub(r'\s*([:;])\s*', r'\1', m.group(1)).strip().rstrip(';') + '"',
+                    markup)
+    return markup.strip()
+
+
+def publish_asset(body, extension, site_dir=SITE_DIR, asset_prefix='guide'):
+    """
+    Writes `body` (bytes) as a content-hashed file under SITE_ASSETS_DIR, so
+    browsers can cache it for good and it only changes when its content does.
+    Returns (url relative to the site root, number of files written).
+    """
+    name = f"{asset_prefix}.{hashlib.sha1(body).hexdigest()[:10]}.{extension}"
+    written = write_site_file(os.path.join(site_dir, SITE_ASSETS_DIR, name), body)
+    return f"{SITE_ASSETS_DIR}/{name}", written
+
+
+def prune_assets(asset_urls, site_dir=SITE_DIR, asset_prefix='guide'):
+    """Removes versions of this prefix's assets that are no longer in `asset_urls`."""
+    keep = {url.rsplit('/', 1)[-1] for url in asset_urls}
+    assets_dir = os.path.join(site_dir, SITE_ASSETS_DIR)
+    asset_name = re.compile(re.escape(asset_prefix) + r'\.[0-9a-f]{10}\.(css|js)')
+    for entry in os.listdir(assets_dir) if os.path.isdir(assets_dir) else []:
+        if asset_name.fullmatch(entry) and entry not in keep:
+            remove_site_file(os.path.join(assets_dir, entry))
+
+# ==============================================================================
+# --- EXPORT FORMATS (published next to the JSON) ---
+# ==============================================================================
+
+@lru_cache(maxsize=None)
+def _day_string(day_number):
+    return (EPOCH.date() + timedelta(days=day_number)).isoformat()
+
+
+def _iso_minutes(minutes):
+    """format_epoch_minutes without a strftime per call."""
+    day_number, minute_of_day = divmod(minutes, MINUTES_PER_DAY)
+    return f"{_day_string(day_number)}T{minute_of_day // 60:02d}:{minute_of_day % 60:02d}:00Z"
+
+
+@lru_cache(maxsize=64 * 1024)
+def _utc_offset_label(tz, wall_hour):
+    """'+0530'-style UTC offset of `tz` at a wall-clock hour (in hours since the epoch)."""
+    offset = int((EPOCH + timedelta(hours=wall_hour)).replace(tzinfo=tz).utcoffset().total_seconds()) // 60
+    return f"{'+' if offset >= 0 else '-'}{abs(offset) // 60:02d}{abs(offset) % 60:02d}"
+
+
+def _xmltv_time(minutes, tz):
+    day_number, minute_of_day = divmod(minutes, MINUTES_PER_DAY)
+    return (f"{_day_string(day_number).replace('-', '')}{minute_of_day // 60:02d}{minute_of_day % 60:02d}00 "
+            f"{_utc_offset_label(tz, minutes // 60)}")
+
+
+def xmltv_channel_id(name):
+    return (re.sub(r'[^a-z0-9]+', '-', (name or '').lower()).strip('-') or 'channel') + '.in'
+
+
+def xmltv_channel_ids(names):
+    """
+    One XMLTV id per channel name, in order. Names that slug to the same id
+    (e.g. '&flix HD' and 'flix HD') get -2, -3, ... after the first one.
+    """
+    ids = []
+    taken = set()
+    for name in names:
+        channel_id = xmltv_channel_id(name)
+        stem = channel_id[:-len('.in')]
+        suffix = 2
+        while channel_id in taken:
+            channel_id = f'{stem}-{suffix}.in'
+            suffix += 1
+        taken.add(channel_id)
+        ids.append(channel_id)
+    return ids
+
+
+def write_xmltv(schedule, out):
+    """
+    XMLTV for media-center tools: every <channel>, then every <programme>,
+    channel by channel, with the UTC offset of the schedule's timezone.
+    """
+    out.write('<?xml version="1.0" encoding="UTF-8"?>\n<!DOCTYPE tv SYSTEM "xmltv.dtd">\n<tv generator-info-name="tv-guide">\n')
+    ids = xmltv_channel_ids(schedule.channel_names)
+    for channel_id, name in zip(ids, schedule.channel_names):
+        out.write(f'  <channel id="{_escape(channel_id)}"><display-name>{_escape(name or "")}</display-name></channel>\n')
+    for channel, channel_id in enumerate(ids):
+        opening = f'" channel="{_escape(channel_id)}">'
+        lines = []
+        for p in schedule.programs(channel):
+            title = f'<title>{_escape(p.title)}</title>' if p.title is not None else '<title></title>'
+            desc = f'<desc>{_escape(p.desc)}</desc>' if p.desc is not None else ''
+            lines.append(f'  <programme start="{_xmltv_time(p.start, schedule.tz)}" stop="{_xmltv_time(p.stop, schedule.tz)}'
+                         f'{opening}{title}{desc}</programme>\n')
+        out.write(''.join(lines))
+    out.write('</tv>\n')
+
+
+def write_ndjson(schedule, out):
+    """One program per line, in the JSON's field names and time format, so it can be read line by line."""
+    dumps = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+    for channel, name in enumerate(schedule.channel_names):
+        prefix = '{"channelname":' + dumps(name) + ',"start":"'
+        lines = []
+        for p in schedule.programs(channel):
+            line = f'{prefix}{_iso_minutes(p.start)}","stop":"{_iso_minutes(p.stop)}"'
+            if p.title is not None:
+                line += ',"title":' + dumps(p.title)
+            if p.desc is not None:
+                line += ',"desc":' + dumps(p.desc)
+            lines.append(line + '}\n')
+        out.write(''.join(lines))
+
+
+_CSV_SPECIAL = re.compile(r'[,"\r\n]')
+
+
+@lru_cache(maxsize=64 * 1024)
+def _csv_field(value):
+    if value is None:
+        return ''
+    if _CSV_SPECIAL.search(value):
+        return '"' + value.replace('"', '""') + '"'
+    return value
+
+
+def write_channels_csv(schedule, out):
+    """The channel dictionary of the columnar export: channel_id -> channel name."""
+    out.write('channel_id,channel_name\n')
+    out.write(''.join(f'{channel},{_csv_field(name)}\n' for channel, name in enumerate(schedule.channel_names)))
+
+
+def write_programs_csv(schedule, out):
+    """
+    The programs of the columnar export, one row each, with the channel as its
+    id in the channel dictionary and the length in minutes instead of a stop
+    time. Times are wall-clock times in the schedule's timezone, like the JSON.
+    """
+    out.write('channel_id,start,duration,title,desc\n')
+    for channel in range(len(schedule.channel_names)):
+        out.write(''.join(
+            f'{channel},{_iso_minutes(p.start)[:16]},{p.stop - p.start},{_csv_field(p.title)},{_csv_field(p.desc)}\n'
+            for p in schedule.programs(channel)
+        ))
+
+
+# Format name -> the site files it writes, each with the function that writes it to a stream.
+EXPORTERS = {
+    'xmltv': [('tv_guide.xml', write_xmltv)],
+    'ndjson': [('tv_guide.ndjson', write_ndjson)],
+    'csv': [('tv_guide_channels.csv', write_channels_csv), ('tv_guide_programs.csv', write_programs_csv)],
+}
+
+
+def write_exports(schedule, formats=EXPORT_FORMATS, site_dir=SITE_DIR):
+    """
+    Streams each of `formats` into SITE_DIR (unchanged files are left alone and
+    the rest are precompressed, as for the guide) and removes the files of
+    formats that are no longer configured. Returns the number of files written.
+    """
+    written = 0
+    for fmt, files in EXPORTERS.items():
+        for file_name, writer in files:
+            path = os.path.join(site_dir, file_name)
+            if fmt not in formats:
+                remove_site_file(path)
+                continue
+            with SiteFileStream(path) as out:
+                writer(schedule, out)
+            written += out.written
+    return written
+
+# ==============================================================================
+# --- PART 2b: VIRTUALIZED GUIDE (OUTPUT_MODE = 'virtual') ---
+# ==============================================================================
+
+def write_virtual_guide_data(schedule, channel_ids, days, data_dir, chunk_size=VIRTUAL_CHUNK_CHANNELS):
+    """
+    Writes one JSON file per day and per `chunk_size` channels, plus a manifest.
+    Each file is a list with one entry per channel; each entry lists that
+    channel's programs as [start minute of day, duration, title, description,
+    time label]; a program running over midnight is clipped to each day.
+    Data of days that left the window is removed.
+    Returns the manifest and the number of files written.
+    """
+    written = 0
+    version = content_hash([
+        [[(start, stop, p.start, p.stop, p.title, p.desc) for start, stop, p in schedule.day_programs(channel, day)]
+         for channel in channel_ids]
+        for day in days
+    ])[:12]
+    manifest = {
+        'channels': [schedule.channel_names[channel] for channel in channel_ids],
+        'chunkSize': chunk_size,
+        'days': [],
+    }
+    for i, day in enumerate(days):
+        day_dir = os.path.join(data_dir, day.isoformat())
+        day_start = day_start_minutes(day)
+        files = []
+        for chunk_num, first in enumerate(range(0, len(channel_ids), chunk_size)):
+            chunk = [
+                [[start - day_start, stop - start,
+                  p.title if p.title is not None else "Untitled Program",
+                  p.desc if p.desc is not None else "No description available.",
+                  f"{format_hhmm(p.start)} - {format_hhmm(p.stop)}"]
+                 for start, stop, p in schedule.day_programs(channel, day) if stop > start]
+                for channel in channel_ids[first:first + chunk_size]
+            ]
+            file_name = f"chunk-{chunk_num}.json"
+            written += write_site_file(os.path.join(day_dir, file_name),
+                                       json.dumps(chunk, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+            files.append(f"{day.isoformat()}/{file_name}?v={version}")
+        manifest['days'].append({'date': day.isoformat(), 'label': day_label(i, day), 'files': files})
+
+    window = {day.isoformat() for day in days}
+    for entry in os.listdir(data_dir):
+        if entry not in window and os.path.isdir(os.path.join(data_dir, entry)):
+            shutil.rmtree(os.path.join(data_dir, entry))
+    written += write_site_file(os.path.join(data_dir, 'manifest.json'),
+                               json.dumps(manifest, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+    return manifest, written
+
+
+VIRTUAL_JAVASCRIPT = """
+        document.addEventListener('DOMContentLoaded', function() {
+            const DATA_DIR = '__DATA_DIR__';
+            const CHANNEL_WIDTH = 200, HOUR_HEIGHT = 80, MINUTE_HEIGHT = HOUR_HEIGHT / 60;
+            const OVERSCAN_CHANNELS = 2, OVERSCAN_MINUTES = 120, PALETTE_SIZE = __PALETTE_SIZE__;
+            const scrollPane = document.querySelector('.schedule-scroll-pane');
+            const timeMarkers = document.querySelector('.time-markers');
+            const channelsHeader = document.querySelector('.channels-header-wrapper');
+            const headerContent = document.querySelector('.channels-header-content');
+            const dateSwitcher = document.querySelector('.date-switcher');
+            const grid = document.querySelector('.schedule-grid');
+            const blocksLayer = document.getElementById('blocks');
+            const timeIndicator = document.querySelector('.time-indicator');
+            const tooltip = document.getElementById('tooltip');
+            const chunkCache = new Map();
+            let manifest = null, dayIndex = 0, framePending = false;
+
+            function loadChunk(day, chunk) {
+                const url = DATA_DIR + '/' + day.files[chunk];
+                if (!chunkCache.has(url)) { chunkCache.set(url, fetch(url).then(r => r.json())); }
+                return chunkCache.get(url);
+            }
+            function visibleRange() {
+                const count = manifest.channels.length;
+                return {
+                    first: Math.max(0, Math.floor(scrollPane.scrollLeft / CHANNEL_WIDTH) - OVERSCAN_CHANNELS),
+                    last: Math.min(count - 1, Math.ceil((scrollPane.scrollLeft + scrollPane.clientWidth) / CHANNEL_WIDTH) + OVERSCAN_CHANNELS),
+                    top: scrollPane.scrollTop / MINUTE_HEIGHT - OVERSCAN_MINUTES,
+                    bottom: (scrollPane.scrollTop + scrollPane.clientHeight) / MINUTE_HEIGHT + OVERSCAN_MINUTES,
+                };
+            }
+            function renderHeaders(range) {
+                const fragment = document.createDocumentFragment();
+                for (let ch = range.first; ch <= range.last; ch++) {
+                    const header = document.createElement('div');
+                    header.className = 'channel-header';
+                    header.style.left = (ch * CHANNEL_WIDTH) + 'px';
+                    header.textContent = manifest.channels[ch];
+                    fragment.appendChild(header);
+                }
+                headerContent.replaceChildren(fragment);
+            }
+            function render() {
+                framePending = false;
+                const day = manifest.days[dayIndex];
+                const range = visibleRange();
+                renderHeaders(range);
+                const chunks = [];
+                for (let c = Math.floor(range.first / manifest.chunkSize); c <= Math.floor(range.last / manifest.chunkSize); c++) { chunks.push(c); }
+                Promise.all(chunks.map(c => loadChunk(day, c))).then(loaded => {
+                    if (day !== manifest.days[dayIndex]) return;
+                    const fragment = document.createDocumentFragment();
+                    loaded.forEach((channels, k) => {
+                        const base = chunks[k] * manifest.chunkSize;
+                        channels.forEach((programs, offset) => {
+                            const ch = base + offset;
+                            if (ch < range.first || ch > range.last) return;
+                            for (const program of programs) {
+                                const [start, duration, title] = program;
+                                if (start + duration < range.top || start > range.bottom) continue;
+                                const block = document.createElement('div');
+                                block.className = 'program-block c' + (ch % PALETTE_SIZE);
+                                block.style.top = (start * MINUTE_HEIGHT) + 'px';
+                                block.style.left = (ch * CHANNEL_WIDTH) + 'px';
+                                block.style.height = (duration * MINUTE_HEIGHT) + 'px';
+                                block.program = program;
+                                const titleEl = document.createElement('span');
+                                titleEl.className = 'program-title';
+                                titleEl.textContent = title;
+                                block.appendChild(titleEl);
+                                if (duration * MINUTE_HEIGHT >= 35) {
+                                    const timeEl = document.createElement('span');
+                                    timeEl.className = 'program-time';
+                                    timeEl.textContent = program[4];
+                                    block.appendChild(timeEl);
+                                }
+                                fragment.appendChild(block);
+                            }
+                        });
+                    });
+                    blocksLayer.replaceChildren(fragment);
+                });
+            }
+            function scheduleRender() {
+                if (!framePending) { framePending = true; requestAnimationFrame(render); }
+            }
+            const guideClock = new Intl.DateTimeFormat('en-GB', { timeZone: document.body.dataset.timezone, hour: 'numeric', minute: 'numeric', hourCycle: 'h23' });
+            function getGuideMinutes() {
+                const parts = guideClock.formatToParts(new Date());
+                const part = type => Number(parts.find(p => p.type === type).value);
+                return part('hour') * 60 + part('minute');
+            }
+            function updateTimeline() {
+                timeIndicator.style.display = dayIndex === 0 ? 'block' : 'none';
+                timeIndicator.style.top = (getGuideMinutes() * MINUTE_HEIGHT) + 'px';
+            }
+            function showDay(index) {
+                dayIndex = index;
+                Array.from(dateSwitcher.children).forEach((button, i) => button.classList.toggle('active', i === index));
+                updateTimeline();
+                scheduleRender();
+            }
+
+            scrollPane.addEventListener('scroll', () => {
+                channelsHeader.scrollLeft = scrollPane.scrollLeft;
+                timeMarkers.scrollTop = scrollPane.scrollTop;
+                scheduleRender();
+            });
+            window.addEventListener('resize', scheduleRender);
+            // One delegated listener per event type for every program block, present or future.
+            blocksLayer.addEventListener('mousemove', function(e) {
+                const block = e.target.closest('.program-block');
+                if (!block) { tooltip.style.display = 'none'; return; }
+                tooltip.style.display = 'block';
+                tooltip.textContent = block.program[3];
+                tooltip.style.left = (e.clientX + 15) + 'px';
+                tooltip.style.top = (e.clientY + 15) + 'px';
+            });
+            blocksLayer.addEventListener('mouseleave', () => { tooltip.style.display = 'none'; });
+            blocksLayer.addEventListener('click', function(e) {
+                const block = e.target.closest('.program-block');
+                if (block) {
+                    window.open(`https://www.google.com/search?q=${encodeURIComponent(block.program[2])}`, '_blank');
+                }
+            });
+
+            fetch(DATA_DIR + '/manifest.json', { cache: 'no-cache' }).then(r => r.json()).then(data => {
+                manifest = data;
+                const width = (manifest.channels.length * CHANNEL_WIDTH) + 'px';
+                grid.style.width = width;
+                headerContent.style.width = width;
+                manifest.days.forEach((day, i) => {
+                    const button = document.createElement('button');
+                    button.textContent = day.label;
+                    button.addEventListener('click', () => showDay(i));
+                    dateSwitcher.appendChild(button);
+                });
+                showDay(0);
+                const nowTop = getGuideMinutes() * MINUTE_HEIGHT;
+                scrollPane.scrollTo({ top: Math.max(0, nowTop - scrollPane.clientHeight / 3) });
+                setInterval(updateTimeline, 60000);
+            });
+        });
+"""
+
+# The virtual page uses GUIDE_CSS plus these rules: its channel headers are placed by the script.
+VIRTUAL_CSS = """
+        .channels-header-content { display: block; position: relative; height: 100%; }
+        .channel-header { position: absolute; top: 0; width: var(--channel-width); }
+"""
+
+VIRTUAL_HTML_TEMPLATE = """
+<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>TV Timeline Guide</title>
+    <link href="https://fonts.googleapis.com/css2?family=Roboto:wght@400;500&display=swap" rel="stylesheet">
+    <link rel="stylesheet" href="{stylesheet_url}">
+</head>
+<body data-timezone="{timezone}">
+    <header class="page-header">
+        <h1>My TV Guide</h1>
+        <div class="date-switcher"></div>
+    </header>
+    <div class="timeline-container">
+        <div class="corner-block"></div>
+        <div class="channels-header-wrapper"><div class="channels-header-content"></div></div>
+        <div class="time-markers">{time_markers_html}</div>
+        <div class="schedule-scroll-pane">
+            <div class="schedule-grid"><div class="time-indicator"></div><div id="blocks"></div></div>
+        </div>
+    </div>
+    <div id="tooltip"></div>
+    <script src="{script_url}"></script>
+</body>
+</html>
+"""
+
+
+def create_virtual_guide(schedule=None, days=None, output_file=HTML_OUTPUT_FILE, site_dir=SITE_DIR,
+                         color_palette=COLOR_PALETTE):
+    """
+    Writes the 'virtual' guide: a small shell page plus data files. The page
+    only builds the blocks of the channels and hours in view, loading each
+    channel chunk of a day on demand, and handles every block through one
+    delegated listener per event, so its size and load time stay flat as the
+    channel count grows. Every channel of `schedule` is shown.
+    """
+    print("\n" + "=" * 60)
+    print("--- Starting HTML Guide Generation (virtualized) ---")
+
+    if schedule is None:
+        try:
+            with open(os.path.join(SITE_DIR, JSON_OUTPUT_FILE), 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            schedule = Schedule.from_channels(data.get('programDetailsByChannel', []))
+        except Exception as e:
+            print(f"❌ Error loading or parsing JSON file: {e}")
+            return
+
+    if days is None:
+        days = guide_dates(tz=schedule.tz)
+    channel_ids = list(range(len(schedule.channel_names)))
+    if not channel_ids:
+        print("❌ Warning: None of your desired channels were found in the schedule.")
+        return
+
+    manifest, written = write_virtual_guide_data(schedule, channel_ids, days, os.path.join(site_dir, VIRTUAL_DATA_DIR))
+    color_classes = ''.join(
+        f'.c{i}{{background-color:{bg};border-color:{border}}}' for i, (bg, border) in enumerate(color_palette)
     )
+    script = (VIRTUAL_JAVASCRIPT
+              .replace('__DATA_DIR__', VIRTUAL_DATA_DIR)
+              .replace('__PALETTE_SIZE__', str(len(color_palette))))
+    css_url, css_written = publish_asset((minify_css(GUIDE_CSS + VIRTUAL_CSS) + color_classes).encode('utf-8'),
+                                         'css', site_dir)
+    js_url, js_written = publish_asset(minify_js(script).encode('utf-8'), 'js', site_dir)
+    final_html = VIRTUAL_HTML_TEMPLATE.format(
+        stylesheet_url=css_url,
+        script_url=js_url,
+        timezone=html.escape(timezone_name(schedule.tz)),
+        time_markers_html=''.join([f'<div class="time-marker"><span>{h:02d}:00</span></div>' for h in range(24)]),
+    )
+    written += css_written + js_written
+    written += write_site_file(os.path.join(site_dir, output_file), minify_html(final_html).encode('utf-8'))
+    prune_assets([css_url, js_url], site_dir)
 
-    with open(HTML_OUTPUT_FILE, 'w', encoding='utf-8') as f:
-        f.write(final_html)
-    
-    print(f"🎉 Success! Your new timeline guide has been created: '{HTML_OUTPUT_FILE}'")
+    files = sum(len(day['files']) for day in manifest['days'])
+    print(f"🎉 Success! Your virtualized guide has been created: '{os.path.join(site_dir, output_file)}' + "
+          f"{files} data file(s) in '{VIRTUAL_DATA_DIR}/' ({written} file(s) written)")
+
+# ==============================================================================
+# --- GUIDE PROFILES (one scrape, many outputs) ---
+# ==============================================================================
+
+def normalize_profile(profile):
+    """A profile dict with every key filled in (see GUIDE_PROFILES)."""
+    palette = profile.get('palette') or COLOR_PALETTE
+    return {
+        'name': profile.get('name') or 'default',
+        'channels': list(profile.get('channels') or []),
+        'timezone': profile.get('timezone') or IST_TIMEZONE_NAME,
+        'path': (profile.get('path') or '').strip('/'),
+        'palette': [tuple(colors) for colors in palette],
+    }
+
+
+def load_profiles(profiles_file=PROFILES_FILE):
+    """
+    The configured profiles: the JSON list in `profiles_file` if it exists,
+    GUIDE_PROFILES otherwise. Raises ValueError for duplicate names or output
+    paths and unknown timezones.
+    """
+    profiles = GUIDE_PROFILES
+    if profiles_file and os.path.exists(profiles_file):
+        with open(profiles_file, 'r', encoding='utf-8') as f:
+            profiles = json.load(f)
+    profiles = [normalize_profile(profile) for profile in profiles]
+
+    for key in ('name', 'path'):
+        values = [profile[key] for profile in profiles]
+        if len(set(values)) != len(values):
+            raise ValueError(f"Guide profiles must have distinct '{key}' values, got {values}")
+    for profile in profiles:
+        try:
+            profile_timezone(profile)
+        except (ZoneInfoNotFoundError, ValueError) as e:
+            raise ValueError(f"Profile '{profile['name']}': unknown timezone {profile['timezone']!r}") from e
+    return profiles
+
+
+def scraped_channels(profiles):
+    """
+    The channels the one scrape has to cover: desired_channels, then any other
+    channel a profile lists. Empty (every channel) when desired_channels is.
+    """
+    if not desired_channels:
+        return []
+    return list(dict.fromkeys([*desired_channels, *(name for profile in profiles for name in profile['channels'])]))
+
+
+def profile_timezone(profile):
+    name = profile['timezone']
+    return IST_TIMEZONE if name == IST_TIMEZONE_NAME else ZoneInfo(name)
+
+
+def profile_window(profiles, num_days=GUIDE_DAYS):
+    """
+    The IST dates whose programs cover every profile's own `num_days` local
+    days: the IST window itself, widened by a day at the end for a zone
+    behind IST and at the start for a zone ahead of it (or whose today is
+    still IST's yesterday).
+    """
+    first, last = guide_dates(num_days)[0], guide_dates(num_days)[-1]
+    for profile in profiles:
+        tz = profile_timezone(profile)
+        days = guide_dates(num_days, tz)
+        start = datetime.combine(days[0], datetime.min.time(), tz).astimezone(IST_TIMEZONE)
+        end = datetime.combine(days[-1] + timedelta(days=1), datetime.min.time(), tz).astimezone(IST_TIMEZONE)
+        first = min(first, start.date())
+        last = max(last, (end - timedelta(minutes=1)).date())
+    return [first + timedelta(days=offset) for offset in range((last - first).days + 1)]
+
+
+def timezone_name(tz):
+    """The IANA name the page's clock uses for `tz`."""
+    return getattr(tz, 'key', None) or IST_TIMEZONE_NAME
+
+
+@lru_cache(maxsize=64 * 1024)
+def _utc_offset_minutes(tz, utc_hour):
+    return int(datetime.fromtimestamp(utc_hour * 3600, timezone.utc).astimezone(tz).utcoffset().total_seconds()) // 60
+
+
+_IST_OFFSET_MINUTES = int(IST_TIMEZONE.utcoffset(None).total_seconds()) // 60
+
+
+def to_profile_minutes(minutes, tz):
+    """IST wall-clock epoch minutes -> wall-clock epoch minutes in `tz`."""
+    utc = minutes - _IST_OFFSET_MINUTES
+    return utc + _utc_offset_minutes(tz, utc // 60)
+
+
+def profile_schedule(schedule, profile):
+    """
+    The profile's view of the scraped schedule: only its channels (in the
+    scraped order), with times moved to its timezone (left as they are when
+    it is IST).
+    """
+    tz = profile_timezone(profile)
+    wanted = set(profile['channels'] or desired_channels)
+    view = Schedule(tz)
+    for channel, name in enumerate(schedule.channel_names):
+        if wanted and name not in wanted:
+            continue
+        target = view.channel_id(name)
+        for p in schedule.programs(channel):
+            if tz is IST_TIMEZONE:
+                view.add_program(target, p.start, p.stop, p.title, p.desc)
+            else:
+                view.add_program(target, to_profile_minutes(p.start, tz), to_profile_minutes(p.stop, tz), p.title, p.desc)
+    return view
+
+
+def render_profile(schedule, profile, num_days=GUIDE_DAYS, grid_cache=None):
+    """
+    Renders one profile from the shared scraped `schedule` into
+    SITE_DIR/<path>: its guide page (in OUTPUT_MODE) and its exports.
+    Returns the profile's grid cache.
+    """
+    view = profile_schedule(schedule, profile)
+    site_dir = os.path.join(SITE_DIR, profile['path']) if profile['path'] else SITE_DIR
+    days = guide_dates(num_days, view.tz)
+    print(f"\n🎛️ Profile '{profile['name']}': {len(view.channel_names)} channel(s), "
+          f"{profile['timezone']}, '{site_dir}/'")
+    if OUTPUT_MODE == 'virtual':
+        create_virtual_guide(view, days, site_dir=site_dir, color_palette=profile['palette'])
+    else:
+        create_timeline_guide(view, grid_cache, days, site_dir=site_dir, color_palette=profile['palette'])
+    written = write_exports(view, site_dir=site_dir)
+    if EXPORT_FORMATS:
+        print(f"📤 Exported {', '.join(EXPORT_FORMATS)} to '{site_dir}/' ({written} file(s) written)")
+    return grid_cache
+
+
+_worker_schedule = None
+
+
+def _init_profile_worker(schedule):
+    global _worker_schedule
+    _worker_schedule = schedule
+
+
+def _render_profile_task(profile, num_days, grid_cache):
+    # The output is handed back so the parent prints each profile's lines together.
+    started = time.perf_counter()
+    log = io.StringIO()
+    with contextlib.redirect_stdout(log):
+        grid_cache = render_profile(_worker_schedule, profile, num_days, grid_cache)
+    return grid_cache, time.perf_counter() - started, log.getvalue()
+
+
+def render_profiles(schedule, profiles, num_days=GUIDE_DAYS, grid_caches=None, workers=PROFILE_WORKERS):
+    """
+    Renders every profile from the one parsed `schedule`, so a profile only
+    costs its render. With more than one profile and worker, profiles render
+    in parallel in a process pool: each worker receives the schedule once, at
+    start-up, and each task carries only its profile (and its grid cache).
+    `grid_caches` maps profile names to their grid caches (None: no caching);
+    returns the updated mapping.
+    """
+    caches = {} if grid_caches is None else grid_caches
+    updated = {}
+    workers = min(workers, len(profiles), os.cpu_count() or 1)
+
+    def record(profile, grid_cache, seconds):
+        metrics.observe('profile_render_seconds', seconds)
+        if grid_caches is not None:
+            updated[profile['name']] = grid_cache
+
+    if workers <= 1:
+        for profile in profiles:
+            started = time.perf_counter()
+            grid_cache = render_profile(schedule, profile, num_days,
+                                        caches.get(profile['name'], {}) if grid_caches is not None else None)
+            record(profile, grid_cache, time.perf_counter() - started)
+        return updated
+
+    sys.stdout.flush()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_profile_worker, initargs=(schedule,)) as pool:
+        futures = [(profile, pool.submit(_render_profile_task, profile, num_days,
+                                         caches.get(profile['name'], {}) if grid_caches is not None else None))
+                   for profile in profiles]
+        for profile, future in futures:
+            grid_cache, seconds, log = future.result()
+            print(log, end='')
+            record(profile, grid_cache, seconds)
+    return updated
+
+
+def prune_grid_fragments(grid_caches, cache_dir=GRID_CACHE_DIR):
+    """Removes the grid files in `cache_dir` that no profile's grid cache refers to any more."""
+    keep = {f"{entry['key']}.html" for cache in grid_caches.values() for entry in cache.values()}
+    try:
+        names = os.listdir(cache_dir)
+    except FileNotFoundError:
+        return
+    for name in names:
+        if name not in keep:
+            os.remove(os.path.join(cache_dir, name))
 
 # ==============================================================================
 # --- MAIN EXECUTION BLOCK ---
 # ==============================================================================
-if __name__ == "__main__":
+def update_guide(fetch=None, state=None, channel_index=None):
+    """
+    One full update: fetch the window, filter, compare with the previous run,
+    merge, archive, print, and write the JSON and HTML when anything changed.
+    A cold run calls it once; the daemon (serve) calls it every cycle with its
+    own long-lived `fetch`, ScrapeState and ChannelPageIndex.
+    Returns (schedule, whether new output was written).
+    """
+    if fetch is None:
+        fetch = fetch_tv_guides_with_credentials
     # --- Step 1: Execute the scraper logic ---
-    token, cookies = get_fresh_credentials()
-    
+    # --- Date Setup (a rolling window of GUIDE_DAYS days, starting today in IST) ---
+    # Widened to the IST days every profile's local days overlap: days from today on are
+    # fetched, an earlier one (for a zone whose today is still IST's yesterday) comes from the archive.
+    profiles = load_profiles()
+    wanted_channels = scraped_channels(profiles)
+    archive_dates = profile_window(profiles)
+    window_dates = [day for day in archive_dates if day >= guide_dates(1)[0]]
+    date_strs = [day.strftime('%d/%m/%Y') for day in window_dates]
+    today_str = date_strs[0]
+
+    if state is None and INCREMENTAL:
+        state = ScrapeState()
+
+    # --- Reuse the day fetched yesterday as part of the look-ahead as today, after midnight ---
+    dates_to_fetch = list(date_strs)
+    reused_days = {}
+    if state and REUSE_TOMORROW_AFTER_MIDNIGHT:
+        cached_today = state.get_day(today_str)
+        if cached_today and cached_today['role'] != 'today':
+            print(f"♻️ Reusing the data fetched yesterday as tomorrow for today ({today_str}).")
+            reused_days[today_str] = (cached_today['channels'], None, [])
+            dates_to_fetch.remove(today_str)
+
+    # --- Fetch Data for every day of the window (only the pages holding the desired channels in targeted mode) ---
+    targeted = TARGETED_FETCH and bool(wanted_channels)
+    if channel_index is None and targeted:
+        channel_index = ChannelPageIndex()
+    results = fetch(dates_to_fetch, state, wanted_channels if targeted else None, channel_index if targeted else None)
+    if channel_index:
+        channel_index.save()
+
     data_was_scraped = False
-    if token and cookies:
-        # --- Date Setup ---
-        today = datetime.now()
-        tomorrow = today + timedelta(days=1)
-        today_str = today.strftime('%d/%m/%Y')
-        tomorrow_str = tomorrow.strftime('%d/%m/%Y')
-
-        # --- Fetch Data for Both Days (Full data) ---
-        today_channels_all, _ = fetch_tv_guide(token, cookies, today_str)
-        tomorrow_channels_all, _ = fetch_tv_guide(token, cookies, tomorrow_str)
-
-        # <<< NEW: Filter the channels based on the desired_channels list >>>
-        if desired_channels:
-            print(f"\nFiltering for {len(desired_channels)} desired channels...")
-            today_channels = [ch for ch in today_channels_all if ch.get('channelname') in desired_channels]
-            tomorrow_channels = [ch for ch in tomorrow_channels_all if ch.get('channelname') in desired_channels]
-        else:
-            # If the desired_channels list is empty, use all channels
-            today_channels = today_channels_all
-            tomorrow_channels = tomorrow_channels_all
+    output_is_current = False
+    schedule = None
+    if results is not None:
+        results.update(reused_days)
+        if state:
+            print(f"\n♻️ Pages unchanged since last run: {state.pages_skipped}, changed: {state.pages_changed}")
+
+        # <<< NEW: Filter the channels based on the desired_channels list (and the profiles' channels) >>>
+        if wanted_channels:
+            print(f"\nFiltering for {len(wanted_channels)} desired channels...")
+        with metrics.span('filter'):
+            channels_by_date = {}
+            wanted_set = set(wanted_channels)
+            for date_str in date_strs:
+                channels_all = results[date_str][0] or []
+                # If the desired_channels list is empty, use all channels
+                channels_by_date[date_str] = [ch for ch in channels_all if not wanted_set or ch.get('channelname') in wanted_set]
+                if not channels_by_date[date_str]:
+                    print(f"⚠️ No channel data for {date_str}.")
+        today_channels = channels_by_date[today_str]
+        metrics.gauge('failed_pages', sum(len(failed or []) for _, _, failed in results.values()))
+        metrics.gauge('channels_kept', sum(len(channels) for channels in channels_by_date.values()))
 
-        # --- Print Guides to console (using the filtered data) ---
+        # --- Compare with the previous run ---
+        if state and today_channels:
+            with metrics.span('compare'):
+                unchanged = changed = 0
+                for date_str, channels in channels_by_date.items():
+                    state.put_day(date_str, channels, 'today' if date_str == today_str else 'ahead')
+                    day_unchanged, day_changed = state.compare_channels(date_str, channels)
+                    unchanged += day_unchanged
+                    changed += day_changed
+            print(f"♻️ Channel schedules unchanged since last run: {unchanged}, changed: {changed}")
+            metrics.gauge('pages_unchanged', state.pages_skipped)
+            metrics.gauge('channels_unchanged', unchanged)
+
+            output_hash = content_hash([OUTPUT_MODE, GUIDE_MARKUP_VERSION, EXPORT_FORMATS, profiles] + [[date_str, state.data['channel_hashes'].get(date_str)] for date_str in date_strs])
+            output_is_current = (output_hash == state.data['output_hash']
+                                 and os.path.exists(os.path.join(SITE_DIR, JSON_OUTPUT_FILE))
+                                 and all(os.path.exists(os.path.join(SITE_DIR, profile['path'], HTML_OUTPUT_FILE))
+                                         for profile in profiles))
+            state.data['output_hash'] = output_hash
+
+        # --- Combine into one schedule (using the filtered data) ---
         if today_channels:
-            print_guide(today_channels, f"TODAY ({today_str})")
-        if tomorrow_channels:
-            print_guide(tomorrow_channels, f"TOMORROW ({tomorrow_str})")
-            
-        # --- Combine and Save Data (using the filtered data) ---
-        if today_channels and tomorrow_channels:
-            combined_channels_dict = {ch['channelname']: ch for ch in today_channels}
-            for tmrw_ch in tomorrow_channels:
-                ch_name = tmrw_ch.get('channelname')
-                if ch_name in combined_channels_dict:
-                    # Append tomorrow's programs to the existing channel's program list
-                    combined_channels_dict[ch_name]['programs'].extend(tmrw_ch.get('programs', []))
-
-            # Convert the dictionary back to a list
-            final_channels_list = list(combined_channels_dict.values())
-            
-            # Save the combined data
-            final_data_structure = {"programDetailsByChannel": final_channels_list}
-            save_filename = 'tv_guide_today_and_tomorrow.json'
-            with open(save_filename, 'w', encoding='utf-8') as f:
-                json.dump(final_data_structure, f, indent=2, ensure_ascii=False)
-            print(f"\n📁 Complete combined data for your desired channels saved to: {save_filename}")
-            data_was_scraped = True
+            with metrics.span('merge'):
+                merged_channels = merge_days(channels_by_date[date_str] for date_str in date_strs)
 
-    else:
-        print("\nCould not retrieve credentials. Aborting scraper.")
+            # Every timestamp is parsed once here; printing, saving and rendering share the result.
+            with metrics.span('schedule'):
+                schedule = Schedule.from_channels(merged_channels)
+
+            # --- Archive the fetched days and read the window back from the store ---
+            # Days that failed to fetch are served from what the archive already has, and so are
+            # configured channels whose pages failed on every fetched day.
+            window_end = archive_dates[-1] + timedelta(days=1)
+            fetched_days = [day for day, date_str in zip(window_dates, date_strs) if channels_by_date[date_str]]
+            seen = set(schedule.channel_names)
+            channel_names = schedule.channel_names + [name for name in wanted_channels if name not in seen]
+            with metrics.span('archive'), ScheduleArchive() as archive:
+                changed_rows = archive.store(schedule, fetched_days)
+                removed_rows = archive.compact()
+                schedule = archive.load_schedule(archive_dates[0], window_end, channel_names)
+            print(f"🗄️ Archive: {changed_rows} program rows added/updated/replaced, {removed_rows} expired rows removed.")
+            metrics.gauge('channels', len(schedule.channel_names))
+            metrics.gauge('programs', len(schedule))
+
+            # --- Print Guides to console ---
+            with metrics.span('print'):
+                for i, (day, date_str) in enumerate(zip(window_dates, date_strs)):
+                    print_guide(schedule, day, f"{day_label(i, day)} ({date_str})")
 
-    # --- Step 2: If scraper was successful, execute the HTML generator logic ---
+            # --- Save the combined data ---
+            if output_is_current:
+                print("\n✅ Schedule unchanged since last run, keeping the existing JSON and HTML.")
+            else:
+                with metrics.span('save_json'):
+                    save_filename = os.path.join(SITE_DIR, JSON_OUTPUT_FILE)
+                    with SiteFileStream(save_filename) as out:
+                        save_schedule_json(schedule, out)
+                print(f"\n📁 Complete combined data for your desired channels saved to: {save_filename}")
+                data_was_scraped = True
+
+    # --- Step 2: If scraper was successful, render every profile from the one schedule ---
     if data_was_scraped:
-        create_timeline_guide()
-    else:
+        with metrics.span('render', mode=OUTPUT_MODE, profiles=len(profiles)):
+            grid_caches = render_profiles(schedule, profiles, GUIDE_DAYS, state.data['day_grids'] if state else None)
+        if state:
+            state.data['day_grids'] = grid_caches
+            prune_grid_fragments(grid_caches)
+    elif not output_is_current:
         print("\nSkipping HTML generation because data scraping failed.")
 
-}
-what next
+    if state:
+        with metrics.span('save_state'):
+            state.prune(date_strs)
+            state.save()
+
+    metrics.gauge('success', int(data_was_scraped or output_is_current))
+    metrics.write_report()
+    metrics.write_prometheus()
+    return schedule, data_was_scraped
+
+
+# ==============================================================================
+# --- DAEMON MODE (python final.py --serve) ---
+# ==============================================================================
+
+class GuideDaemon:
+    """
+    Long-running form of the scraper. Instead of a cold process per update,
+    one process keeps the EPGClient (and its keep-alive connections), the
+    credentials, the ScrapeState, the channel page index and the last
+    Schedule in memory, and runs update_guide() every SERVE_INTERVAL seconds
+    with jitter. Credentials are only refreshed when they are about to expire
+    or the endpoint rejects them; output is only rewritten when data changed.
+    """
+    def __init__(self, interval=SERVE_INTERVAL, jitter=SERVE_JITTER, request_url=None):
+        self.interval = interval
+        self.jitter = jitter
+        self.request_url = request_url
+        self.state = ScrapeState() if INCREMENTAL else None
+        self.channel_index = ChannelPageIndex() if TARGETED_FETCH and desired_channels else None
+        self.client = None
+        self.credentials_expire_at = 0
+        self.schedule = None
+        self.cycles = 0
+        self.last_cycle = None
+        self.stop_event = threading.Event()
+        self._lock = threading.Lock()
+
+    def _ensure_credentials(self, force_refresh=False):
+        if not force_refresh and self.client is not None \
+                and time.time() < self.credentials_expire_at - CREDENTIALS_REFRESH_MARGIN:
+            return True
+        token, cookies, _ = get_credentials(force_refresh)
+        if not (token and cookies):
+            return False
+        self.credentials_expire_at = cached_credentials_expiry()
+        if self.client is None:
+            self.client = EPGClient(token, cookies, self.request_url)
+        else:
+            self.client.set_credentials(token, cookies)
+        return True
+
+    def fetch(self, target_date_strs, state=None, wanted_channels=None, channel_index=None):
+        """fetch_tv_guides_with_credentials, but with the client kept between cycles."""
+        if not self._ensure_credentials():
+            print("\nCould not retrieve credentials. Skipping this update.")
+            return None
+        for attempt in range(2):
+            try:
+                with metrics.span('fetch', dates=len(target_date_strs)):
+                    results = fetch_tv_guides(self.client, target_date_strs, state, wanted_channels, channel_index)
+                print(f"\n📊 EPG client stats: {self.client.stats()}")
+                return results
+            except CredentialsRejectedError as e:
+                clear_cached_credentials()
+                print(f"🔑 Credentials were rejected ({e}). Refreshing with the browser...")
+                if attempt or not self._ensure_credentials(force_refresh=True):
+                    return None
+
+    def run_cycle(self):
+        """One update. Each cycle gets its own RunMetrics, so run_report.json describes the latest cycle."""
+        global metrics
+        metrics = RunMetrics()
+        started = time.perf_counter()
+        schedule, output_written = update_guide(self.fetch, self.state, self.channel_index)
+        with self._lock:
+            if schedule is not None:
+                self.schedule = schedule
+            self.cycles += 1
+            self.last_cycle = {
+                'finished_at': datetime.now().isoformat(timespec='seconds'),
+                'seconds': round(time.perf_counter() - started, 3),
+                'ok': schedule is not None,
+                'output_written': output_written,
+            }
+        return output_written
+
+    def next_delay(self):
+        return max(0.0, self.interval + random.uniform(-self.jitter, self.jitter))
+
+    def run(self, max_cycles=None):
+        while not self.stop_event.is_set():
+            try:
+                self.run_cycle()
+            except Exception as e:
+                # A bad cycle must not take the daemon down; the next one starts from the same state.
+                print(f"❌ Update cycle failed: {e}")
+                with self._lock:
+                    self.cycles += 1
+                    self.last_cycle = {'finished_at': datetime.now().isoformat(timespec='seconds'),
+                                       'ok': False, 'error': str(e)}
+            if max_cycles is not None and self.cycles >= max_cycles:
+                break
+            delay = self.next_delay()
+            print(f"💤 Next update in {delay / 60:.1f} minutes.")
+            self.stop_event.wait(delay)
+
+    def status(self):
+        with self._lock:
+            return {
+                'cycles': self.cycles,
+                'last_cycle': self.last_cycle,
+                'channels': len(self.schedule.channel_names) if self.schedule else 0,
+                'programs': len(self.schedule) if self.schedule else 0,
+                'credentials_expire_at': self.credentials_expire_at,
+                'client': self.client.stats() if self.client else None,
+            }
+
+    def close(self):
+        self.stop_event.set()
+        if self.client is not None:
+            self.client.close()
+
+
+def make_guide_server(daemon, host=SERVE_HOST, port=SERVE_PORT, site_dir=SITE_DIR):
+    """
+    Local HTTP server for the daemon: serves the published site (the guide and
+    its JSON), preferring the precompressed .br/.gz siblings when the client
+    accepts them, and the daemon's status as JSON at /status.
+    """
+    site_root = os.path.abspath(site_dir)
+    os.makedirs(site_root, exist_ok=True)
+
+    class GuideRequestHandler(SimpleHTTPRequestHandler):
+        extensions_map = {**SimpleHTTPRequestHandler.extensions_map, '.ndjson': 'application/x-ndjson'}
+
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, directory=site_root, **kwargs)
+
+        def send_head(self):
+            url_path = self.path.split('?', 1)[0]
+            if url_path == '/status':
+                body = json.dumps(daemon.status()).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                return io.BytesIO(body)
+
+            path = self.translate_path(self.path)
+            if url_path.endswith('/') and os.path.isdir(path):
+                path = os.path.join(path, 'index.html')
+            accepted = self.headers.get('Accept-Encoding', '')
+            if os.path.isfile(path):
+                for encoding, extension in (('br', '.br'), ('gzip', '.gz')):
+                    if encoding in accepted and os.path.isfile(path + extension):
+                        f = open(path + extension, 'rb')
+                        self.send_response(200)
+                        self.send_header('Content-Type', self.guess_type(path))
+                        self.send_header('Content-Encoding', encoding)
+                        self.send_header('Content-Length', str(os.fstat(f.fileno()).st_size))
+                        self.send_header('Vary', 'Accept-Encoding')
+                        self.end_headers()
+                        return f
+            return super().send_head()
+
+        def end_headers(self):
+            # Hashed assets never change under the same name; everything else is revalidated.
+            immutable = self.path.startswith(f'/{SITE_ASSETS_DIR}/')
+            self.send_header('Cache-Control', 'public, max-age=31536000, immutable' if immutable else 'no-cache')
+            super().end_headers()
+
+        def log_message(self, format, *args):
+            pass
+
+    httpd = ThreadingHTTPServer((host, port), GuideRequestHandler)
+    httpd.daemon_threads = True
+    return httpd
+
+
+def serve(host=SERVE_HOST, port=SERVE_PORT, interval=SERVE_INTERVAL, jitter=SERVE_JITTER):
+    daemon = GuideDaemon(interval, jitter)
+    httpd = make_guide_server(daemon, host, port)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    print(f"🌐 Serving the guide on http://{host}:{httpd.server_address[1]}/ (status at /status)")
+    try:
+        daemon.run()
+    except KeyboardInterrupt:
+        print("\n👋 Stopping.")
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+        daemon.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scrape the Dish TV guide and build the HTML timeline.")
+    parser.add_argument('--serve', action='store_true',
+                        help="keep running: update on a schedule and serve the guide over HTTP")
+    parser.add_argument('--host', default=SERVE_HOST)
+    parser.add_argument('--port', type=int, default=SERVE_PORT)
+    parser.add_argument('--interval', type=float, default=SERVE_INTERVAL, help="seconds between updates")
+    subcommands = parser.add_subparsers(dest='command')
+    query_parser = subcommands.add_parser('query', help="answer now/next/range/search questions from the saved schedule")
+    queries = query_parser.add_subparsers(dest='query', required=True)
+    now_parser = queries.add_parser('now', help="what is on now, and next, on each channel")
+    next_parser = queries.add_parser('next', help="everything airing in the next N minutes")
+    next_parser.add_argument('minutes', nargs='?', type=int, default=30)
+    range_parser = queries.add_parser('range', help="everything airing between two times")
+    range_parser.add_argument('start', help="e.g. 2025-10-17T20:00 (IST)")
+    range_parser.add_argument('stop')
+    search_parser = queries.add_parser('search', help="upcoming airings whose title matches")
+    search_parser.add_argument('text')
+    search_parser.add_argument('--limit', type=int, default=20)
+    for sub in (now_parser, next_parser, range_parser, search_parser):
+        sub.add_argument('--channel', action='append', help="limit to this channel (repeatable)")
+        if sub is not range_parser:
+            sub.add_argument('--at', help="ask as of this time instead of now, e.g. 2025-10-17T20:00 (IST)")
+    args = parser.parse_args()
+
+    if args.command == 'query':
+        run_query(args)
+    elif args.serve:
+        serve(args.host, args.port, args.interval)
+    else:
+        update_guide()